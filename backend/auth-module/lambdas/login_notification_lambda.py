@@ -56,6 +56,7 @@ def handler(event, context):
             Item={
                 'user_id': user_id,
                 'login_timestamp': login_time,
+                'login_date': login_time[:10],  # Partition key of LoginsByDateIndex
                 'email': email_attr
             }
         )
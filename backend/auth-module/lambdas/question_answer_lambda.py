@@ -1,8 +1,10 @@
 import random
+import time
 import boto3
 import os
 import logging
 import json
+from collections import OrderedDict
 
 dynamodb = boto3.client('dynamodb')
 table_name = os.environ['DYNAMODB_TABLE']
@@ -11,6 +13,44 @@ logger.setLevel(logging.INFO)
 
 lambda_client = boto3.client('lambda')
 
+# Security questions cached per warm container: {userId: (expires at, (question, answer) or None)}.
+# Unknown users are cached too, for a shorter time: store_qa writes the record
+# at sign-up, before the email is confirmed, so a negative entry has expired by
+# the time the new user can sign in.
+CHALLENGE_CACHE_TTL_SECONDS = int(os.environ.get('CHALLENGE_CACHE_TTL_SECONDS', '60'))
+UNKNOWN_USER_TTL_SECONDS = int(os.environ.get('UNKNOWN_USER_TTL_SECONDS', '10'))
+CHALLENGE_CACHE_SIZE = int(os.environ.get('CHALLENGE_CACHE_SIZE', '4096'))
+challenge_cache = OrderedDict()
+
+def challenge_record(user_id):
+    """
+    Return (question, answer) for the user, or None if none is stored
+    """
+    entry = challenge_cache.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        challenge_cache.move_to_end(user_id)
+        return entry[1]
+
+    # Only the challenge attributes, not the whole profile
+    response = dynamodb.get_item(
+        TableName=table_name,
+        Key={'userId': {'S': str(user_id)}},
+        ProjectionExpression='securityQuestion, securityAnswer'
+    )
+    item = response.get('Item', {})
+    if 'securityQuestion' in item and 'securityAnswer' in item:
+        record = (item['securityQuestion']['S'], item['securityAnswer']['S'])
+        ttl = CHALLENGE_CACHE_TTL_SECONDS
+    else:
+        record = None
+        ttl = UNKNOWN_USER_TTL_SECONDS
+
+    challenge_cache[user_id] = (time.monotonic() + ttl, record)
+    challenge_cache.move_to_end(user_id)
+    while len(challenge_cache) > CHALLENGE_CACHE_SIZE:
+        challenge_cache.popitem(last=False)
+    return record
+
 def lambda_handler(event, context):
     logger.info("=== Event Received ===")
     logger.info(json.dumps(event))
@@ -52,13 +92,10 @@ def lambda_handler(event, context):
         if len(session) == 0:
             # First challenge — Q&A from DynamoDB
             try:
-                response = dynamodb.get_item(
-                    TableName=table_name,
-                    Key={'userId': {'S': str(user_id)}}
-                )
-                item = response.get('Item', {})
-                question = item['securityQuestion']['S']
-                answer = item['securityAnswer']['S']
+                record = challenge_record(user_id)
+                if record is None:
+                    raise KeyError(f"No security question stored for {user_id}")
+                question, answer = record
                 event['response'] = {
                     'publicChallengeParameters': {'question': question},
                     'privateChallengeParameters': {'answer': answer},
@@ -42,6 +42,8 @@ resource "aws_dynamodb_table" "dalscooter_users" {
   name           = "DALScooterUsers"
   billing_mode   = "PAY_PER_REQUEST"
   hash_key       = "userId"
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
 
   attribute {
     name = "userId"
@@ -170,6 +172,8 @@ resource "aws_dynamodb_table" "user_logins" {
   billing_mode   = "PAY_PER_REQUEST"
   hash_key       = "user_id"
   range_key      = "login_timestamp"
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
 
   attribute {
     name = "user_id"
@@ -181,6 +185,19 @@ resource "aws_dynamodb_table" "user_logins" {
     type = "S"
   }
 
+  attribute {
+    name = "login_date"
+    type = "S"
+  }
+
+  # Recent logins across all users, one partition per day
+  global_secondary_index {
+    name            = "LoginsByDateIndex"
+    hash_key        = "login_date"
+    range_key       = "login_timestamp"
+    projection_type = "ALL"
+  }
+
   tags = {
     Name = "UserLogins"
   }
@@ -10,6 +10,14 @@ output "dynamodb_table_name" {
   value = aws_dynamodb_table.dalscooter_users.name
 }
 
+output "users_table_stream_arn" {
+  value = aws_dynamodb_table.dalscooter_users.stream_arn
+}
+
+output "user_logins_table_stream_arn" {
+  value = aws_dynamodb_table.user_logins.stream_arn
+}
+
 output "api_gateway_endpoint" {
   value = aws_apigatewayv2_api.dalscooter_http_api.api_endpoint
 }
@@ -1,16 +1,67 @@
 import json
+import base64
 import boto3
 import os
 import uuid
 import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from boto3.dynamodb.conditions import Key
 from decimal import Decimal
+from datetime import datetime, timedelta, timezone
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super(DecimalEncoder, self).default(o)
+try:
+    import orjson
+except ImportError:  # optional: bundle it with the function to enable the fast path
+    orjson = None
+
+def decimal_default(o):
+    # DynamoDB numbers come back as Decimal
+    if isinstance(o, Decimal):
+        return int(o) if o == o.to_integral_value() else float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def number(text):
+    # DynamoDB sends numbers as strings
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def from_attribute(value):
+    """
+    Convert one low-level DynamoDB attribute value ({"S": ...}, {"N": ...}, ...)
+    straight to its JSON-native form
+    """
+    (kind, data), = value.items()
+    if kind == "S" or kind == "BOOL" or kind == "SS":
+        return data
+    if kind == "N":
+        return number(data)
+    if kind == "L":
+        return [from_attribute(element) for element in data]
+    if kind == "M":
+        return from_item(data)
+    if kind == "NS":
+        return [number(element) for element in data]
+    if kind == "NULL":
+        return None
+    raise TypeError(f"Unsupported DynamoDB attribute type {kind}")
+
+def from_item(item):
+    """
+    Convert a low-level DynamoDB item to a JSON-ready dict in one pass. Bike
+    reads use this instead of the resource API, whose Decimal numbers would be
+    deserialized per value and then sent back through a default= hook.
+    """
+    return {key: from_attribute(value) for key, value in item.items()}
+
+def dumps(body):
+    if orjson is not None:
+        return orjson.dumps(body, default=decimal_default).decode()
+    return json.dumps(body, default=decimal_default, separators=(",", ":"))
 
 # Configure logging
 logger = logging.getLogger()
@@ -19,6 +70,105 @@ logger.setLevel(logging.INFO)
 # DynamoDB setup
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["DYNAMODB_TABLE"])
+slots_table = dynamodb.Table(os.environ.get("SLOTS_TABLE", "DALScooterBikeSlots"))
+
+# Low-level client for the bike reads returned to callers (see from_item),
+# built on first use and reused by later invocations in the container
+@lru_cache(maxsize=None)
+def raw_client():
+    return boto3.client("dynamodb")
+
+# Width of one reservation slot in the per-bike interval index (see booking module)
+SLOT_MINUTES = 15
+# Sort key of the per-bike generation counter in the slot index (see booking module)
+GENERATION_KEY = "#generation"
+# Availability answers cached per container, keyed by (bikeId, first slot, last slot)
+AVAILABILITY_CACHE_SIZE = int(os.environ.get("AVAILABILITY_CACHE_SIZE", "1024"))
+AVAILABILITY_CACHE_TTL_SECONDS = int(os.environ.get("AVAILABILITY_CACHE_TTL_SECONDS", "300"))
+availability_cache = OrderedDict()
+# Longest availability window, in slots: the longest booking (see booking module)
+MAX_WINDOW_SLOTS = 98
+# Parallel slot-range queries for GET /bikes/available (botocore's default pool size)
+SLOT_QUERY_WORKERS = 10
+# Bike attributes returned to guests (never includes accessCode)
+PUBLIC_BIKE_FIELDS = ["bikeId", "type", "model", "batteryLife", "hourlyRate", "discount", "features", "status"]
+# Attributes that may be requested through GET /bikes?fields=
+BIKE_FIELDS = PUBLIC_BIKE_FIELDS + ["accessCode", "createdBy", "createdAt"]
+# Page size bounds for GET /bikes?limit=
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def slot_range(start_datetime, end_datetime):
+    """
+    Return (first slot key, last slot key, slot count) for the half-open window
+    [start, end), computed without enumerating the slots in between
+    """
+    start_utc = start_datetime.astimezone(timezone.utc)
+    end_utc = end_datetime.astimezone(timezone.utc)
+    first = start_utc.replace(minute=start_utc.minute - start_utc.minute % SLOT_MINUTES, second=0, microsecond=0)
+    if end_utc <= start_utc:
+        return None, None, 0
+    step = timedelta(minutes=SLOT_MINUTES)
+    count = -((first - end_utc) // step)  # ceiling division
+    last = first + (count - 1) * step
+    return first.strftime("%Y-%m-%dT%H:%MZ"), last.strftime("%Y-%m-%dT%H:%MZ"), count
+
+def parse_window(query_params):
+    """
+    Validate ?startDate=&endDate= and return ((first slot, last slot), None),
+    or (None, error response)
+    """
+    start_date = query_params.get("startDate")
+    end_date = query_params.get("endDate")
+    if not start_date or not end_date:
+        return None, respond(400, {"error": "Missing startDate or endDate parameters"})
+    try:
+        start_datetime = datetime.fromisoformat(start_date.replace("Z", "+00:00"))
+        end_datetime = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
+        first_slot, last_slot, count = slot_range(start_datetime, end_datetime)
+    except (ValueError, TypeError, OverflowError) as e:
+        return None, respond(400, {"error": f"Invalid date format: {str(e)}"})
+    if count == 0:
+        return None, respond(400, {"error": "startDate must be before endDate"})
+    if count > MAX_WINDOW_SLOTS:
+        return None, respond(400, {"error": f"The time period cannot be longer than {MAX_WINDOW_SLOTS * SLOT_MINUTES // 60} hours"})
+    return (first_slot, last_slot), None
+
+def slot_generation(bike_id):
+    """
+    Current generation of the bike's slots; bumped by every booking change
+    and bike update, so a matching generation means a cached answer still holds
+    """
+    response = slots_table.get_item(
+        Key={"bikeId": bike_id, "slotStart": GENERATION_KEY},
+        ProjectionExpression="generation",
+        ConsistentRead=True
+    )
+    return int(response.get("Item", {}).get("generation", 0))
+
+def bump_slot_generation(bike_id):
+    slots_table.update_item(
+        Key={"bikeId": bike_id, "slotStart": GENERATION_KEY},
+        UpdateExpression="ADD generation :step",
+        ExpressionAttributeValues={":step": 1}
+    )
+
+def cached_availability(key, generation):
+    entry = availability_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, cached_generation, body = entry
+    if cached_generation != generation or expires_at <= time.monotonic():
+        del availability_cache[key]
+        return None
+    availability_cache.move_to_end(key)
+    return body
+
+def cache_availability(key, generation, body):
+    availability_cache[key] = (time.monotonic() + AVAILABILITY_CACHE_TTL_SECONDS, generation, body)
+    availability_cache.move_to_end(key)
+    while len(availability_cache) > AVAILABILITY_CACHE_SIZE:
+        availability_cache.popitem(last=False)
 
 def lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event)}")
@@ -28,7 +178,10 @@ def lambda_handler(event, context):
 
     try:
         if method == "GET" and path == "/bikes":
-            return list_bikes()
+            return list_bikes(event.get("queryStringParameters", {}) or {})
+
+        if method == "GET" and path == "/bikes/available":
+            return list_available_bikes(event.get("queryStringParameters", {}) or {})
 
         if method == "GET" and path.startswith("/bikes/") and path.endswith("/availability"):
             bike_id = path_params.get("bikeId")
@@ -48,11 +201,74 @@ def lambda_handler(event, context):
         logger.error(f"Unexpected error: {str(e)}")
         return respond(500, {"error": str(e)})
 
-def list_bikes():
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if not isinstance(key, dict):
+        raise ValueError("cursor is not a key")
+    # Cursors issued before listings used the low-level client hold plain strings
+    return {name: value if isinstance(value, dict) else {"S": value} for name, value in key.items()}
+
+def list_bikes(query_params):
+    """
+    List bikes
+    Query parameters (all optional):
+      fields - comma-separated attributes to return (bikeId is always included)
+      limit  - page size; returns a page with a nextCursor instead of the full list
+      cursor - nextCursor from the previous page
+    """
     try:
-        response = table.scan()
-        logger.info("Listed all bikes successfully.")
-        return respond(200, response["Items"])
+        scan_params = {"TableName": table.name}
+
+        fields = query_params.get("fields")
+        if fields:
+            requested = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in requested if field not in BIKE_FIELDS]
+            if unknown:
+                return respond(400, {"error": f"Unknown fields: {', '.join(unknown)}"})
+            if "bikeId" not in requested:
+                requested.insert(0, "bikeId")
+            scan_params["ProjectionExpression"] = ", ".join(f"#{field}" for field in requested)
+            scan_params["ExpressionAttributeNames"] = {f"#{field}": field for field in requested}
+
+        limit = query_params.get("limit")
+        cursor = query_params.get("cursor")
+
+        if limit is None and cursor is None:
+            # Full listing: follow LastEvaluatedKey so nothing past 1 MB is dropped
+            response = raw_client().scan(**scan_params)
+            items = [from_item(item) for item in response["Items"]]
+            while "LastEvaluatedKey" in response:
+                response = raw_client().scan(ExclusiveStartKey=response["LastEvaluatedKey"], **scan_params)
+                items.extend(from_item(item) for item in response["Items"])
+            logger.info("Listed all bikes successfully.")
+            return respond(200, items)
+
+        try:
+            page_size = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        except ValueError:
+            return respond(400, {"error": "limit must be an integer"})
+        if page_size < 1 or page_size > MAX_PAGE_SIZE:
+            return respond(400, {"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"})
+        scan_params["Limit"] = page_size
+
+        if cursor:
+            try:
+                scan_params["ExclusiveStartKey"] = decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return respond(400, {"error": "Invalid cursor"})
+
+        response = raw_client().scan(**scan_params)
+        items = [from_item(item) for item in response["Items"]]
+        next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+        logger.info(f"Listed page of {len(items)} bikes.")
+        return respond(200, {
+            "bikes": items,
+            "count": len(items),
+            "nextCursor": next_cursor
+        })
     except Exception as e:
         logger.error(f"Error listing bikes: {str(e)}")
         return respond(500, {"error": str(e)})
@@ -66,64 +282,56 @@ def check_bike_availability(bike_id, query_params):
         if not bike_id:
             return respond(400, {"error": "Missing bikeId"})
         
-        start_date = query_params.get("startDate")
-        end_date = query_params.get("endDate")
+        window, error = parse_window(query_params)
+        if error is not None:
+            return error
+        first_slot, last_slot = window
         
-        if not start_date or not end_date:
-            return respond(400, {"error": "Missing startDate or endDate parameters"})
+        # Answers depend only on the bike and the slots the window covers. Read the
+        # generation before computing, so a change racing this poll is never cached
+        # as current; an unchanged bike costs this single read.
+        cache_key = (bike_id, first_slot, last_slot)
+        generation = slot_generation(bike_id)
+        cached = cached_availability(cache_key, generation)
+        if cached is not None:
+            return respond(200, cached)
         
         # First check if the bike exists
-        bike_response = table.get_item(Key={"bikeId": bike_id})
+        bike_response = raw_client().get_item(TableName=table.name, Key={"bikeId": {"S": bike_id}})
         if "Item" not in bike_response:
             return respond(404, {"error": "Bike not found"})
         
-        bike = bike_response["Item"]
-        
-        # Check for booking conflicts by querying the bookings table
-        # We need to import boto3.client for this
-        import boto3
-        dynamodb_client = boto3.client('dynamodb')
-        bookings_table = os.environ.get("BOOKINGS_TABLE", "DALScooterBookings")
+        bike = from_item(bike_response["Item"])
         
         try:
-            # Query for conflicting bookings
-            conflict_query_params = {
-                'TableName': bookings_table,
-                'IndexName': 'BikeBookingsIndex',
-                'KeyConditionExpression': 'bikeId = :bikeId',
-                'FilterExpression': '#status = :status AND startDate <= :endDate AND endDate >= :startDate',
-                'ExpressionAttributeNames': {
-                    '#status': 'status'
-                },
-                'ExpressionAttributeValues': {
-                    ':bikeId': {'S': bike_id},
-                    ':status': {'S': 'active'},
-                    ':startDate': {'S': start_date},
-                    ':endDate': {'S': end_date}
-                }
-            }
-            
-            conflict_response = dynamodb_client.query(**conflict_query_params)
+            # Read only the claimed slots inside the requested window from the interval index
+            conflict_response = slots_table.query(
+                KeyConditionExpression=Key("bikeId").eq(bike_id) & Key("slotStart").between(first_slot, last_slot),
+                Limit=1
+            )
             
             if conflict_response.get('Items'):
                 # Bike is not available due to conflicting bookings
                 conflicting_booking = conflict_response['Items'][0]
-                return respond(200, {
+                answer = {
                     "available": False,
                     "reason": "Bike is already booked for this time period",
                     "bike": bike,
                     "conflictingBooking": {
-                        "startDate": conflicting_booking['startDate']['S'],
-                        "endDate": conflicting_booking['endDate']['S']
+                        "startDate": conflicting_booking['startDate'],
+                        "endDate": conflicting_booking['endDate']
                     }
-                })
+                }
             else:
                 # Bike is available for the requested time period
-                return respond(200, {
+                answer = {
                     "available": True,
                     "bike": bike,
                     "message": "Bike is available for the requested time period"
-                })
+                }
+            
+            cache_availability(cache_key, generation, answer)
+            return respond(200, answer)
                 
         except Exception as e:
             logger.error(f"Error checking booking conflicts: {str(e)}")
@@ -138,6 +346,82 @@ def check_bike_availability(bike_id, query_params):
         logger.error(f"Error checking bike availability: {str(e)}")
         return respond(500, {"error": str(e)})
 
+def claimed_bike_ids(bike_ids, first_slot, last_slot):
+    """
+    Return the subset of bike_ids holding at least one slot in
+    [first_slot, last_slot]. Each bike costs one slot-range query that stops
+    at its first claim, run in parallel, however long the window is.
+    """
+    # Clients, unlike resources, can be shared between threads
+    client = raw_client()
+
+    def is_claimed(bike_id):
+        response = client.query(
+            TableName=slots_table.name,
+            KeyConditionExpression="bikeId = :bikeId AND slotStart BETWEEN :firstSlot AND :lastSlot",
+            ExpressionAttributeValues={
+                ":bikeId": {"S": bike_id},
+                ":firstSlot": {"S": first_slot},
+                ":lastSlot": {"S": last_slot}
+            },
+            ProjectionExpression="bikeId",
+            Limit=1
+        )
+        return bool(response.get("Items"))
+
+    if not bike_ids:
+        return set()
+    with ThreadPoolExecutor(max_workers=min(len(bike_ids), SLOT_QUERY_WORKERS)) as executor:
+        return {bike_id for bike_id, claimed in zip(bike_ids, executor.map(is_claimed, bike_ids)) if claimed}
+
+def list_available_bikes(query_params):
+    """
+    List every bike that is free for a given time period
+    Query parameters: startDate, endDate (ISO 8601 format), type (optional)
+    """
+    try:
+        start_date = query_params.get("startDate")
+        end_date = query_params.get("endDate")
+        bike_type = query_params.get("type")
+
+        window, error = parse_window(query_params)
+        if error is not None:
+            return error
+        first_slot, last_slot = window
+
+        # Only bikes marked available can be booked at all
+        filter_expr = "#status = :available"
+        filter_values = {":available": {"S": "available"}}
+        if bike_type:
+            filter_expr += " AND #type = :type"
+            filter_values[":type"] = {"S": bike_type}
+        scan_params = {
+            "TableName": table.name,
+            "FilterExpression": filter_expr,
+            "ProjectionExpression": ", ".join(f"#{field}" for field in PUBLIC_BIKE_FIELDS),
+            "ExpressionAttributeNames": {f"#{field}": field for field in PUBLIC_BIKE_FIELDS},
+            "ExpressionAttributeValues": filter_values
+        }
+        response = raw_client().scan(**scan_params)
+        bikes = [from_item(bike) for bike in response.get("Items", [])]
+        while "LastEvaluatedKey" in response:
+            response = raw_client().scan(ExclusiveStartKey=response["LastEvaluatedKey"], **scan_params)
+            bikes.extend(from_item(bike) for bike in response.get("Items", []))
+
+        claimed = claimed_bike_ids([bike["bikeId"] for bike in bikes], first_slot, last_slot)
+        available = [bike for bike in bikes if bike["bikeId"] not in claimed]
+
+        logger.info(f"{len(available)} of {len(bikes)} bikes available from {start_date} to {end_date}")
+        return respond(200, {
+            "startDate": start_date,
+            "endDate": end_date,
+            "bikes": available,
+            "count": len(available)
+        })
+    except Exception as e:
+        logger.error(f"Error listing available bikes: {str(e)}")
+        return respond(500, {"error": str(e)})
+
 def create_bike(body):
     try:
         bike_id = str(uuid.uuid4())
@@ -152,7 +436,8 @@ def create_bike(body):
             "features": body.get("features", []),
             "status": body.get("status", "available"),  # Default status to available
             "createdBy": body.get("createdBy"),
-            "createdAt": body.get("createdAt")
+            "createdAt": body.get("createdAt"),
+            "version": 1  # Bumped on every update; bookings are checked against it
         }
         table.put_item(Item=item)
         logger.info(f"Created new bike: {bike_id}")
@@ -170,7 +455,7 @@ def update_bike(bike_id, body):
         expr_attr_vals = {}
         expr_attr_names = {}
         for key, val in body.items():
-            if key == "bikeId":
+            if key in ("bikeId", "version"):
                 continue
             placeholder = f"#{key}" if key.lower() in ["type"] else key
             update_expr.append(f"{placeholder} = :{key}")
@@ -182,14 +467,20 @@ def update_bike(bike_id, body):
             if key.lower() in ["type"]:
                 expr_attr_names[f"#{key}"] = key
 
+        # Stamp a new version so booking containers holding this bike in their
+        # cache fail their transaction check instead of acting on stale data
+        expr_attr_vals[":versionStep"] = 1
+        expr_attr_names["#version"] = "version"
+
         update_params = {
             "Key": {"bikeId": bike_id},
-            "UpdateExpression": "SET " + ", ".join(update_expr),
-            "ExpressionAttributeValues": expr_attr_vals
+            "UpdateExpression": "SET " + ", ".join(update_expr) + " ADD #version :versionStep",
+            "ExpressionAttributeValues": expr_attr_vals,
+            "ExpressionAttributeNames": expr_attr_names
         }
-        if expr_attr_names:
-            update_params["ExpressionAttributeNames"] = expr_attr_names
         table.update_item(**update_params)
+        # Cached availability answers embed the bike, so retire them
+        bump_slot_generation(bike_id)
         logger.info(f"Updated bike: {bike_id}")
         return respond(200, {"message": "Bike updated."})
     except Exception as e:
@@ -201,7 +492,10 @@ def delete_bike(bike_id):
         logger.warning("Missing bikeId for delete request.")
         return respond(400, {"message": "Missing bikeId in path."})
     try:
+        # Removing the item also retires its version stamp: bookings validated
+        # against a cached copy fail their transaction check
         table.delete_item(Key={"bikeId": bike_id})
+        bump_slot_generation(bike_id)
         logger.info(f"Deleted bike: {bike_id}")
         return respond(200, {"message": "Bike deleted."})
     except Exception as e:
@@ -212,5 +506,5 @@ def respond(status, body):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(body, cls=DecimalEncoder)
+        "body": dumps(body)
     }
\ No newline at end of file
@@ -29,6 +29,7 @@ resource "aws_lambda_function" "bike_crud_handler" {
     variables = {
       DYNAMODB_TABLE = aws_dynamodb_table.bike_inventory.name
       BOOKINGS_TABLE = "DALScooterBookings"
+      SLOTS_TABLE    = "DALScooterBikeSlots"
     }
   }
 }
@@ -80,6 +81,13 @@ resource "aws_apigatewayv2_route" "get_bike_availability" {
   target    = "integrations/${aws_apigatewayv2_integration.bike_lambda_integration.id}"
 }
 
+# GET /bikes/available is PUBLIC (fleet-wide availability search)
+resource "aws_apigatewayv2_route" "get_available_bikes" {
+  api_id    = aws_apigatewayv2_api.bike_api.id
+  route_key = "GET /bikes/available"
+  target    = "integrations/${aws_apigatewayv2_integration.bike_lambda_integration.id}"
+}
+
 # SECURED routes (POST, PUT, DELETE)
 resource "aws_apigatewayv2_route" "post_bike" {
   api_id    = aws_apigatewayv2_api.bike_api.id
@@ -0,0 +1,129 @@
+import os
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from booking_common import (
+    dynamodb, parse_date, booking_slots, reschedule_slot_writes, bump_slot_generation,
+    MAX_TRANSACTION_ITEMS
+)
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+bookings_table = os.environ.get('BOOKINGS_TABLE', 'DALScooterBookings')
+
+# Number of parallel segments used for the bookings scan
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+
+def claim_booking(booking, now):
+    """
+    Write the slot claims of one active booking that has not ended yet.
+    Returns 'claimed', 'skipped' or 'conflict'.
+    """
+    try:
+        start_datetime = parse_date(booking['startDate']['S'])
+        end_datetime = parse_date(booking['endDate']['S'])
+        if end_datetime.tzinfo is None:
+            end_datetime = end_datetime.replace(tzinfo=timezone.utc)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Skipping booking {booking['bookingId']['S']}: {str(e)}")
+        return 'skipped'
+    if end_datetime <= now:
+        return 'skipped'
+
+    slots = booking_slots(start_datetime, end_datetime)
+    # Claims succeed when the slot is free or already held by this booking,
+    # so the backfill can be re-run safely
+    claims, _ = reschedule_slot_writes(
+        booking['bikeId']['S'], booking['bookingId']['S'],
+        booking['startDate']['S'], booking['endDate']['S'],
+        slots, [], int(end_datetime.timestamp())
+    )
+    for i in range(0, len(claims), MAX_TRANSACTION_ITEMS):
+        try:
+            dynamodb.transact_write_items(TransactItems=claims[i:i + MAX_TRANSACTION_ITEMS])
+        except dynamodb.exceptions.TransactionCanceledException:
+            # Another booking already holds one of these slots: the two were
+            # double-booked before the slot index existed
+            logger.error(f"Booking {booking['bookingId']['S']} overlaps another booking of bike {booking['bikeId']['S']}")
+            return 'conflict'
+    return 'claimed'
+
+def stamp_record_type(booking):
+    """
+    Set recordType on a booking written before CreatedAtIndex existed, so the
+    admin listing (which reads only that index) includes it
+    """
+    try:
+        dynamodb.update_item(
+            TableName=bookings_table,
+            Key={'bookingId': booking['bookingId']},
+            UpdateExpression='SET recordType = :recordType',
+            ConditionExpression='attribute_exists(bookingId) AND attribute_not_exists(recordType)',
+            ExpressionAttributeValues={':recordType': {'S': 'booking'}}
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        pass  # deleted or stamped since the scan read it
+
+def backfill_segment(segment, now):
+    scan_params = {
+        'TableName': bookings_table,
+        'Segment': segment,
+        'TotalSegments': SCAN_SEGMENTS,
+        'ProjectionExpression': 'bookingId, bikeId, startDate, endDate, #status, recordType',
+        'ExpressionAttributeNames': {'#status': 'status'}
+    }
+    counts = {'claimed': 0, 'skipped': 0, 'conflict': 0, 'stamped': 0}
+    conflicts = []
+    bikes = set()
+    while True:
+        response = dynamodb.scan(**scan_params)
+        for booking in response.get('Items', []):
+            if 'recordType' not in booking:
+                stamp_record_type(booking)
+                counts['stamped'] += 1
+            if booking.get('status', {}).get('S') != 'active':
+                continue
+            outcome = claim_booking(booking, now)
+            counts[outcome] += 1
+            if outcome == 'conflict':
+                conflicts.append(booking['bookingId']['S'])
+            elif outcome == 'claimed':
+                bikes.add(booking['bikeId']['S'])
+        if 'LastEvaluatedKey' not in response:
+            return counts, conflicts, bikes
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def lambda_handler(event, context):
+    """
+    Backfill DALScooterBikeSlots with the claims of every active booking that
+    has not ended yet, and set recordType on bookings that lack it.
+    create_booking only detects conflicts through the slot index and the admin
+    listing only reads CreatedAtIndex, so this has to run before the new
+    handlers take traffic; the deployment invokes it before and again after
+    replacing them (the second run picks up bookings made by the old handlers
+    in between). Idempotent.
+    """
+    now = datetime.now(timezone.utc)
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+        results = list(executor.map(lambda segment: backfill_segment(segment, now), range(SCAN_SEGMENTS)))
+
+    totals = {'claimed': 0, 'skipped': 0, 'conflict': 0, 'stamped': 0}
+    conflicts = []
+    bikes = set()
+    for counts, segment_conflicts, segment_bikes in results:
+        for outcome, count in counts.items():
+            totals[outcome] += count
+        conflicts.extend(segment_conflicts)
+        bikes.update(segment_bikes)
+
+    # Cached availability answers for these bikes predate their claims
+    for bike_id in bikes:
+        bump_slot_generation(bike_id)
+
+    logger.info(f"Booking backfill: {totals}; overlapping bookings: {conflicts}")
+    return {'statusCode': 200, 'counts': totals, 'conflicts': conflicts}
+
+if __name__ == '__main__':
+    print(lambda_handler({}, None))
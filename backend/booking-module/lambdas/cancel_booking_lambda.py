@@ -1,17 +1,19 @@
-import json
-import boto3
 import os
 from datetime import datetime
 import logging
+from booking_common import (
+    dynamodb, respond, extract_user, Booking, parse_date, slot_releases, write_slot_requests,
+    bump_slot_generation, ADMIN_GROUP, MAX_TRANSACTION_ITEMS
+)
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 
+ALLOWED_METHODS = 'DELETE,OPTIONS'
+
 def lambda_handler(event, context):
     """
     Cancel a booking
@@ -19,78 +21,27 @@ def lambda_handler(event, context):
     try:
         # Extract user info from Cognito claims
         try:
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
+            user_id, user_email, user_groups = extract_user(event)
+            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
             
-            # For API Gateway v2 with JWT authorizer, claims are directly in the authorizer
-            # The structure is: authorizer.jwt.claims
-            if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
-                claims = authorizer['jwt']['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'claims' in authorizer:
-                # Fallback for different authorizer structure
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            else:
-                # Last resort: try to extract from authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
             # Validate that we got a real user ID
             if user_id == 'unknown':
                 logger.error("Failed to extract user ID from JWT claims")
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid authentication token - user ID not found'
-                    })
-                }
+                return respond(401, {'error': 'Invalid authentication token - user ID not found'}, ALLOWED_METHODS)
                 
         except (KeyError, TypeError) as e:
             logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+            return respond(401, {'error': 'Invalid authentication token'}, ALLOWED_METHODS)
         
         # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        is_admin = ADMIN_GROUP in user_groups
         
         # Get booking ID from path parameters
         path_params = event.get('pathParameters', {}) or {}
         booking_id = path_params.get('bookingId')
         
         if not booking_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Booking ID is required'
-                })
-            }
+            return respond(400, {'error': 'Booking ID is required'}, ALLOWED_METHODS)
         
         # Get the existing booking
         try:
@@ -100,182 +51,112 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in booking_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking not found'
-                    })
-                }
+                return respond(404, {'error': 'Booking not found'}, ALLOWED_METHODS)
             
             existing_booking = booking_response['Item']
             
             # Check if user owns this booking (unless admin)
             if not is_admin and existing_booking['userId']['S'] != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'You can only cancel your own bookings'
-                    })
-                }
+                return respond(403, {'error': 'You can only cancel your own bookings'}, ALLOWED_METHODS)
             
             # Check if booking can be cancelled
             booking_status = existing_booking['status']['S']
             if booking_status == 'cancelled':
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking is already cancelled'
-                    })
-                }
+                return respond(400, {'error': 'Booking is already cancelled'}, ALLOWED_METHODS)
             
             if booking_status == 'completed':
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Cannot cancel a completed booking'
-                    })
-                }
+                return respond(400, {'error': 'Cannot cancel a completed booking'}, ALLOWED_METHODS)
             
             # Check if booking has already started
             start_date = existing_booking['startDate']['S']
             try:
-                start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+                start_datetime = parse_date(start_date)
                 # Use timezone-aware datetime.now() for comparison
                 current_time = datetime.now().replace(tzinfo=start_datetime.tzinfo)
                 if start_datetime < current_time:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                            'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                        },
-                        'body': json.dumps({
-                            'error': 'Cannot cancel a booking that has already started'
-                        })
-                    }
+                    return respond(400, {'error': 'Cannot cancel a booking that has already started'}, ALLOWED_METHODS)
             except ValueError:
                 logger.warning(f"Invalid start date format for booking {booking_id}")
                 
         except Exception as e:
             logger.error(f"Error retrieving booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error retrieving booking'
-                })
-            }
+            return respond(500, {'error': 'Error retrieving booking'}, ALLOWED_METHODS)
         
         # Cancel the booking
         current_time = datetime.utcnow().isoformat() + 'Z'
         
+        bike_id = existing_booking['bikeId']['S']
+        
         try:
-            dynamodb.update_item(
-                TableName=bookings_table,
-                Key={'bookingId': {'S': booking_id}},
-                UpdateExpression="SET #status = :status, #updatedAt = :updatedAt",
-                ExpressionAttributeNames={
-                    '#status': 'status',
-                    '#updatedAt': 'updatedAt'
-                },
-                ExpressionAttributeValues={
-                    ':status': {'S': 'cancelled'},
-                    ':updatedAt': {'S': current_time}
+            # The status change and the release of the booking's slots commit
+            # together, and only against the booking as it was read: a reschedule
+            # that lands in between cancels the transaction instead of leaving
+            # the new window's claims behind.
+            releases = slot_releases(
+                bike_id,
+                booking_id,
+                existing_booking['startDate']['S'],
+                existing_booking['endDate']['S']
+            ) if booking_status == 'active' else []
+            transact_items = [
+                {
+                    'Update': {
+                        'TableName': bookings_table,
+                        'Key': {'bookingId': {'S': booking_id}},
+                        'UpdateExpression': "SET #status = :status, #updatedAt = :updatedAt",
+                        'ConditionExpression': '#startDate = :expectedStart AND #endDate = :expectedEnd AND #status = :expectedStatus',
+                        'ExpressionAttributeNames': {
+                            '#status': 'status',
+                            '#updatedAt': 'updatedAt',
+                            '#startDate': 'startDate',
+                            '#endDate': 'endDate'
+                        },
+                        'ExpressionAttributeValues': {
+                            ':status': {'S': 'cancelled'},
+                            ':updatedAt': {'S': current_time},
+                            ':expectedStart': {'S': existing_booking['startDate']['S']},
+                            ':expectedEnd': {'S': existing_booking['endDate']['S']},
+                            ':expectedStatus': {'S': booking_status}
+                        }
+                    }
                 }
-            )
+            ]
+            # Bookings longer than one transaction (only ones that predate the
+            # slot limit) release the rest right after; no other booking can
+            # claim a slot this booking still holds
+            overflow = releases[MAX_TRANSACTION_ITEMS - 1:]
+            dynamodb.transact_write_items(TransactItems=transact_items + releases[:MAX_TRANSACTION_ITEMS - 1])
             
             logger.info(f"Booking {booking_id} cancelled successfully")
             
+            try:
+                if overflow:
+                    write_slot_requests([
+                        {'DeleteRequest': {'Key': release['Delete']['Key']}} for release in overflow
+                    ])
+                if releases:
+                    bump_slot_generation(bike_id)
+            except Exception as e:
+                logger.error(f"Error releasing slots for booking {booking_id}: {str(e)}")
+            
             # Note: We don't update bike status anymore since availability is checked dynamically
             # based on existing bookings rather than a simple status field
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                },
-                'body': json.dumps({
-                    'message': 'Booking cancelled successfully',
-                    'bookingId': booking_id,
-                    'cancelledAt': current_time,
-                    'booking': {
-                        'bookingId': booking_id,
-                        'userId': existing_booking['userId']['S'],
-                        'userEmail': existing_booking.get('userEmail', {}).get('S', ''),
-                        'bikeId': existing_booking['bikeId']['S'],
-                        'startDate': existing_booking['startDate']['S'],
-                        'endDate': existing_booking['endDate']['S'],
-                        'duration': int(existing_booking['duration']['N']),
-                        'status': 'cancelled',
-                        'notes': existing_booking.get('notes', {}).get('S', ''),
-                        'createdAt': existing_booking['createdAt']['S'],
-                        'updatedAt': current_time,
-                        'bikeModel': existing_booking.get('bikeModel', {}).get('S', 'Unknown'),
-                        'bikeType': existing_booking.get('bikeType', {}).get('S', 'Unknown')
-                    }
-                })
-            }
+            return respond(200, {
+                'message': 'Booking cancelled successfully',
+                'bookingId': booking_id,
+                'cancelledAt': current_time,
+                'booking': dict(Booking.from_dynamo(existing_booking).to_api(), status='cancelled', updatedAt=current_time)
+            }, ALLOWED_METHODS)
+            
+        except dynamodb.exceptions.TransactionCanceledException as e:
+            logger.error(f"Cancel transaction cancelled: {str(e)}")
+            return respond(409, {'error': 'Booking was changed by another request, please try again'}, ALLOWED_METHODS)
             
         except Exception as e:
             logger.error(f"Error cancelling booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error cancelling booking'
-                })
-            }
+            return respond(500, {'error': 'Error cancelling booking'}, ALLOWED_METHODS)
             
     except Exception as e:
         logger.error(f"Unexpected error in cancel_booking_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, ALLOWED_METHODS) 
\ No newline at end of file
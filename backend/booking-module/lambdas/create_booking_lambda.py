@@ -1,21 +1,83 @@
 import json
-import boto3
 import os
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
+from booking_common import (
+    dynamodb, get_client, respond, Booking, extract_user, parse_date, parse_duration,
+    booking_slots, slot_claims, conflicting_claim, bump_slot_generation, TTLCache, SLOT_MINUTES, MAX_SLOTS
+)
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 bike_inventory_table = os.environ['BIKE_INVENTORY_TABLE']
-sns = boto3.client("sns")
 sns_topic_arn = os.environ["SNS_TOPIC_ARN"]
 
+ALLOWED_METHODS = 'POST,OPTIONS'
+
+# Bike metadata cached per container. A cached 'available' bike is re-checked
+# inside the booking transaction against its version stamp (bumped by every
+# bike update), so a stale entry can never produce a booking.
+bike_cache = TTLCache(
+    int(os.environ.get('BIKE_CACHE_SIZE', '512')),
+    int(os.environ.get('BIKE_CACHE_TTL_SECONDS', '60'))
+)
+
+def load_bike(bike_id):
+    """
+    Read the bike's booking-relevant attributes and refresh its cache entry
+    """
+    bike_response = dynamodb.get_item(
+        TableName=bike_inventory_table,
+        Key={'bikeId': {'S': bike_id}},
+        ProjectionExpression='bikeId, #status, #model, #type, #version',
+        ExpressionAttributeNames={'#status': 'status', '#model': 'model', '#type': 'type', '#version': 'version'}
+    )
+    bike_data = bike_response.get('Item')
+    if bike_data is None:
+        bike_cache.invalidate(bike_id)
+    else:
+        bike_cache.put(bike_id, bike_data)
+    return bike_data
+
+def bike_version_check(bike_data):
+    """
+    Transaction condition: the bike still exists at the version it was validated at
+    """
+    check = {
+        'TableName': bike_inventory_table,
+        'Key': {'bikeId': bike_data['bikeId']},
+        'ExpressionAttributeNames': {'#version': 'version'}
+    }
+    if 'version' in bike_data:
+        check['ConditionExpression'] = '#version = :version'
+        check['ExpressionAttributeValues'] = {':version': bike_data['version']}
+    else:
+        # Bikes written before version stamps were introduced
+        check['ConditionExpression'] = 'attribute_exists(bikeId) AND attribute_not_exists(#version)'
+    return {'ConditionCheck': check}
+
+def bike_rejection(bike_data):
+    """
+    Error response if the bike cannot be booked, else None
+    """
+    if bike_data is None:
+        return respond(404, {'error': 'Bike not found'}, ALLOWED_METHODS)
+    status = bike_data.get('status', {}).get('S', 'available')
+    if status != 'available':
+        return respond(409, {'error': f'Bike is currently {status}'}, ALLOWED_METHODS)
+    return None
+
+def bike_changed(error):
+    """
+    True if the booking transaction failed on the bike version check (item 1)
+    """
+    reasons = error.response.get('CancellationReasons', [])
+    return len(reasons) > 1 and reasons[1].get('Code') == 'ConditionalCheckFailed'
+
 def lambda_handler(event, context):
     """
     Create a new booking for an e-scooter
@@ -32,243 +94,70 @@ def lambda_handler(event, context):
         
         # Extract user info from Cognito claims
         try:
-            # Debug the authorizer structure
-            logger.info(f"Authorizer structure: {json.dumps(event.get('requestContext', {}).get('authorizer', {}), default=str)}")
+            user_id, user_email, user_groups = extract_user(event)
+            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
             
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            
-            # For API Gateway v2 with JWT authorizer, claims are directly in the authorizer
-            # The structure is: authorizer.jwt.claims
-            if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
-                claims = authorizer['jwt']['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                logger.info(f"Extracted from jwt.claims - user_id: {user_id}, user_email: {user_email}")
-            elif 'claims' in authorizer:
-                # Fallback for different authorizer structure
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                logger.info(f"Extracted from claims - user_id: {user_id}, user_email: {user_email}")
-            else:
-                # Last resort: try to extract from authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                logger.info(f"Extracted from authorizer directly - user_id: {user_id}, user_email: {user_email}")
-                
             # Validate that we got a real user ID
             if user_id == 'unknown':
                 logger.error("Failed to extract user ID from JWT claims")
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid authentication token - user ID not found'
-                    })
-                }
+                return respond(401, {'error': 'Invalid authentication token - user ID not found'}, ALLOWED_METHODS)
                 
         except (KeyError, TypeError) as e:
             logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+            return respond(401, {'error': 'Invalid authentication token'}, ALLOWED_METHODS)
         
         # Validate required fields
         required_fields = ['bikeId', 'startDate', 'endDate', 'duration']
         for field in required_fields:
             if field not in body:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': f'Missing required field: {field}'
-                    })
-                }
+                return respond(400, {'error': f'Missing required field: {field}'}, ALLOWED_METHODS)
         
         bike_id = body['bikeId']
         start_date = body['startDate']
         end_date = body['endDate']
-        duration = body['duration']
+        duration = parse_duration(body['duration'])
         notes = body.get('notes', '')
         
+        if duration is None:
+            return respond(400, {'error': 'Duration must be a positive whole number of hours'}, ALLOWED_METHODS)
+        
         # Validate dates
         try:
-            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+            start_datetime = parse_date(start_date)
+            end_datetime = parse_date(end_date)
             
             if start_datetime >= end_datetime:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Start date must be before end date'
-                    })
-                }
+                return respond(400, {'error': 'Start date must be before end date'}, ALLOWED_METHODS)
             
             # Use timezone-aware datetime.now() for comparison
             current_time = datetime.now().replace(tzinfo=start_datetime.tzinfo)
             if start_datetime < current_time:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Start date cannot be in the past'
-                    })
-                }
+                return respond(400, {'error': 'Start date cannot be in the past'}, ALLOWED_METHODS)
                 
         except ValueError as e:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': f'Invalid date format: {str(e)}'
-                })
-            }
+            return respond(400, {'error': f'Invalid date format: {str(e)}'}, ALLOWED_METHODS)
         
         # Check if bike exists
         try:
-            bike_response = dynamodb.get_item(
-                TableName=bike_inventory_table,
-                Key={'bikeId': {'S': bike_id}}
-            )
+            # Only a cached 'available' verdict is used as is; a miss or any
+            # other status is confirmed with a fresh read before rejecting
+            bike_data = bike_cache.get(bike_id)
+            if bike_data is None or bike_data.get('status', {}).get('S', 'available') != 'available':
+                bike_data = load_bike(bike_id)
             
-            if 'Item' not in bike_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Bike not found'
-                    })
-                }
-            
-            bike_data = bike_response['Item']
-            
-            # Check if bike is available
-            if bike_data.get('status', {}).get('S', 'available') != 'available':
-                return {
-                    'statusCode': 409,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': f'Bike is currently {bike_data.get("status", {}).get("S", "unavailable")}'
-                    })
-                }
-                
         except Exception as e:
             logger.error(f"Error checking bike: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error checking bike'
-                })
-            }
+            return respond(500, {'error': 'Error checking bike'}, ALLOWED_METHODS)
         
-        # Check for booking conflicts (overlapping time periods)
-        try:
-            # Query existing bookings for this bike that overlap with the requested time period
-            # We need to check for any active bookings that overlap
-            conflict_query_params = {
-                'TableName': bookings_table,
-                'IndexName': 'BikeBookingsIndex',
-                'KeyConditionExpression': 'bikeId = :bikeId',
-                'FilterExpression': '#status = :status AND startDate <= :endDate AND endDate >= :startDate',
-                'ExpressionAttributeNames': {
-                    '#status': 'status'
-                },
-                'ExpressionAttributeValues': {
-                    ':bikeId': {'S': bike_id},
-                    ':status': {'S': 'active'},
-                    ':startDate': {'S': start_date},
-                    ':endDate': {'S': end_date}
-                }
-            }
-            
-            conflict_response = dynamodb.query(**conflict_query_params)
-            
-            if conflict_response.get('Items'):
-                conflicting_booking = conflict_response['Items'][0]
-                return {
-                    'statusCode': 409,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Bike is already booked for this time period',
-                        'conflictingBooking': {
-                            'startDate': conflicting_booking['startDate']['S'],
-                            'endDate': conflicting_booking['endDate']['S']
-                        }
-                    })
-                }
-                
-        except Exception as e:
-            logger.error(f"Error checking booking conflicts: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error checking booking availability'
-                })
-            }
+        # Check that the bike exists and is available
+        rejection = bike_rejection(bike_data)
+        if rejection is not None:
+            return rejection
         
-
+        # Slots this booking will claim in the per-bike interval index
+        slots = booking_slots(start_datetime, end_datetime)
+        if len(slots) > MAX_SLOTS:
+            return respond(400, {'error': f'Bookings cannot be longer than {MAX_SLOTS * SLOT_MINUTES // 60} hours'}, ALLOWED_METHODS)
         
         # Create booking
         booking_id = str(uuid.uuid4())
@@ -286,106 +175,122 @@ def lambda_handler(event, context):
             'notes': {'S': notes},
             'createdAt': {'S': current_time},
             'updatedAt': {'S': current_time},
-            'bookingDate': {'S': start_date.split('T')[0]}  # For GSI
+            'bookingDate': {'S': start_date.split('T')[0]},  # For GSI
+            'recordType': {'S': 'booking'}  # Partition key of CreatedAtIndex
         }
         
-        # Add bike details to booking
-        booking_item['bikeModel'] = bike_data.get('model', {'S': 'Unknown'})
-        booking_item['bikeType'] = bike_data.get('type', {'S': 'Unknown'})
+        # DynamoDB TTL drops the claims once the booking has ended
+        claims = slot_claims(bike_id, booking_id, start_date, end_date, slots, int(end_datetime.timestamp()))
         
-        try:
-            dynamodb.put_item(
-                TableName=bookings_table,
-                Item=booking_item
-            )
+        # Write the booking and claim its slots in one transaction. If another
+        # booking already holds any slot, or the bike changed since it was
+        # validated, the whole transaction is cancelled, so concurrent requests
+        # for the same bike can never both succeed. A changed bike (usually a
+        # stale cache entry) is re-read, re-validated and retried once.
+        for attempt in range(2):
+            # Add bike details to booking
+            booking_item['bikeModel'] = bike_data.get('model', {'S': 'Unknown'})
+            booking_item['bikeType'] = bike_data.get('type', {'S': 'Unknown'})
+            
+            transact_items = [
+                {
+                    'Put': {
+                        'TableName': bookings_table,
+                        'Item': booking_item,
+                        'ConditionExpression': 'attribute_not_exists(bookingId)'
+                    }
+                },
+                bike_version_check(bike_data)
+            ] + claims
             
-            logger.info(f"Booking created successfully: {booking_id}")
+            try:
+                dynamodb.transact_write_items(TransactItems=transact_items)
+                break
+                
+            except dynamodb.exceptions.TransactionCanceledException as e:
+                if bike_changed(e):
+                    try:
+                        bike_data = load_bike(bike_id)
+                    except Exception as load_error:
+                        logger.error(f"Error re-reading bike {bike_id}: {str(load_error)}")
+                        return respond(500, {'error': 'Error checking bike'}, ALLOWED_METHODS)
+                    
+                    rejection = bike_rejection(bike_data)
+                    if rejection is not None:
+                        return rejection
+                    if attempt == 1:
+                        return respond(409, {'error': 'Bike details changed, please try again'}, ALLOWED_METHODS)
+                    
+                    logger.info(f"Bike {bike_id} changed since it was validated, retrying booking {booking_id}")
+                    continue
+                
+                conflicting_slot = conflicting_claim(e)
+                if conflicting_slot is None:
+                    logger.error(f"Booking transaction cancelled: {str(e)}")
+                    return respond(409, {'error': 'Booking could not be completed, please try again'}, ALLOWED_METHODS)
+                
+                return respond(409, {
+                    'error': 'Bike is already booked for this time period',
+                    'conflictingBooking': {
+                        'startDate': conflicting_slot['startDate']['S'],
+                        'endDate': conflicting_slot['endDate']['S']
+                    }
+                }, ALLOWED_METHODS)
+                
+            except Exception as e:
+                logger.error(f"Error creating booking: {str(e)}")
+                
+                get_client('sns').publish(
+                    TopicArn=sns_topic_arn,
+                    Subject="DALScooter Booking Failed",
+                    Message=(
+                        f"Hello {user_email},\n\n"
+                        f"Unfortunately, your booking attempt failed.\n\n"
+                        f"Booking details:\nBike ID: {bike_id}\n"
+                        f"Start: {start_date}, End: {end_date}\n\n"
+                        f"Please try again or contact support if the issue persists."
+                    )
+                )
+                
+                return respond(500, {'error': 'Error creating booking'}, ALLOWED_METHODS)
+        
+        # The booking is committed from here on: follow-up failures are logged
+        # and never turned into an error response
+        logger.info(f"Booking created successfully: {booking_id}")
 
-            # Note: We don't update bike status to "unavailable" here
-            # The bike remains available for other time periods
-            # Availability is checked dynamically based on existing bookings
+        # Invalidate cached availability answers for this bike
+        try:
+            bump_slot_generation(bike_id)
+        except Exception as e:
+            logger.error(f"Error bumping slot generation for bike {bike_id}: {str(e)}")
 
-            # Publish booking confirmation to SNS
-            sns.publish(
+        # Note: We don't update bike status to "unavailable" here
+        # The bike remains available for other time periods
+        # Availability is checked dynamically based on existing bookings
+
+        # Publish booking confirmation to SNS
+        try:
+            get_client('sns').publish(
                 TopicArn=sns_topic_arn,
                 Subject="DALScooter Booking Confirmation",
                 Message=(
                     f"Hello {user_email},\n\n"
                     f"Booking confirmed!\n\n"
                     f"Booking ID: {booking_id}\n"
-                    f"Bike: {bike_data.get('model', {'S': 'Unknown'})['S']} ({bike_data.get('type', {'S': 'Unknown'})['S']})\n"
+                    f"Bike: {booking_item['bikeModel']['S']} ({booking_item['bikeType']['S']})\n"
                     f"From: {start_date}\nTo: {end_date}\n\n"
                     f"Thank you for choosing DALScooter!"
                 )
             )
-            
-            return {
-                'statusCode': 201,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'message': 'Booking created successfully',
-                    'bookingId': booking_id,
-                    'booking': {
-                        'bookingId': booking_id,
-                        'userId': user_id,
-                        'userEmail': user_email,
-                        'bikeId': bike_id,
-                        'startDate': start_date,
-                        'endDate': end_date,
-                        'duration': duration,
-                        'status': 'active',
-                        'notes': notes,
-                        'createdAt': current_time,
-                        'bikeModel': booking_item['bikeModel']['S'],
-                        'bikeType': booking_item['bikeType']['S']
-                    }
-                })
-            }
-            
         except Exception as e:
-            logger.error(f"Error creating booking: {str(e)}")
-
-            sns.publish(
-                TopicArn=sns_topic_arn,
-                Subject="DALScooter Booking Failed",
-                Message=(
-                    f"Hello {user_email},\n\n"
-                    f"Unfortunately, your booking attempt failed.\n\n"
-                    f"Booking details:\nBike ID: {bike_id}\n"
-                    f"Start: {start_date}, End: {end_date}\n\n"
-                    f"Please try again or contact support if the issue persists."
-                )
-            )
-
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error creating booking'
-                })
-            }
+            logger.error(f"Error sending booking confirmation for {booking_id}: {str(e)}")
+        
+        return respond(201, {
+            'message': 'Booking created successfully',
+            'bookingId': booking_id,
+            'booking': Booking.from_dynamo(booking_item).to_api()
+        }, ALLOWED_METHODS)
             
     except Exception as e:
         logger.error(f"Unexpected error in create_booking_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'POST,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, ALLOWED_METHODS) 
\ No newline at end of file
@@ -1,17 +1,15 @@
-import json
-import boto3
 import os
-from datetime import datetime
 import logging
+from booking_common import dynamodb, respond, extract_user, Booking, ADMIN_GROUP
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 
+ALLOWED_METHODS = 'GET,OPTIONS'
+
 def lambda_handler(event, context):
     """
     Get detailed information about a specific booking
@@ -19,78 +17,27 @@ def lambda_handler(event, context):
     try:
         # Extract user info from Cognito claims
         try:
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
+            user_id, user_email, user_groups = extract_user(event)
+            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
             
-            # For API Gateway v2 with JWT authorizer, claims are directly in the authorizer
-            # The structure is: authorizer.jwt.claims
-            if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
-                claims = authorizer['jwt']['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'claims' in authorizer:
-                # Fallback for different authorizer structure
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            else:
-                # Last resort: try to extract from authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
             # Validate that we got a real user ID
             if user_id == 'unknown':
                 logger.error("Failed to extract user ID from JWT claims")
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid authentication token - user ID not found'
-                    })
-                }
+                return respond(401, {'error': 'Invalid authentication token - user ID not found'}, ALLOWED_METHODS)
                 
         except (KeyError, TypeError) as e:
             logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+            return respond(401, {'error': 'Invalid authentication token'}, ALLOWED_METHODS)
         
         # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        is_admin = ADMIN_GROUP in user_groups
         
         # Get booking ID from path parameters
         path_params = event.get('pathParameters', {}) or {}
         booking_id = path_params.get('bookingId')
         
         if not booking_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Booking ID is required'
-                })
-            }
+            return respond(400, {'error': 'Booking ID is required'}, ALLOWED_METHODS)
         
         # Get the booking details
         try:
@@ -100,137 +47,29 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in booking_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking not found'
-                    })
-                }
+                return respond(404, {'error': 'Booking not found'}, ALLOWED_METHODS)
             
             booking_item = booking_response['Item']
             
             # Check if user owns this booking (unless admin)
             if not is_admin and booking_item['userId']['S'] != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'You can only view your own bookings'
-                    })
-                }
-            
-            # Format the booking details
-            booking = {
-                'bookingId': booking_item['bookingId']['S'],
-                'userId': booking_item['userId']['S'],
-                'userEmail': booking_item.get('userEmail', {}).get('S', ''),
-                'bikeId': booking_item['bikeId']['S'],
-                'startDate': booking_item['startDate']['S'],
-                'endDate': booking_item['endDate']['S'],
-                'duration': int(booking_item['duration']['N']),
-                'status': booking_item['status']['S'],
-                'notes': booking_item.get('notes', {}).get('S', ''),
-                'createdAt': booking_item['createdAt']['S'],
-                'updatedAt': booking_item.get('updatedAt', {}).get('S', ''),
-                'bikeModel': booking_item.get('bikeModel', {}).get('S', 'Unknown'),
-                'bikeType': booking_item.get('bikeType', {}).get('S', 'Unknown')
-            }
+                return respond(403, {'error': 'You can only view your own bookings'}, ALLOWED_METHODS)
             
-            # Add additional calculated fields
-            try:
-                start_datetime = datetime.fromisoformat(booking['startDate'].replace('Z', '+00:00'))
-                end_datetime = datetime.fromisoformat(booking['endDate'].replace('Z', '+00:00'))
-                current_time = datetime.now().replace(tzinfo=start_datetime.tzinfo)
-                
-                # Calculate time until booking starts
-                if start_datetime > current_time:
-                    time_until_start = start_datetime - current_time
-                    booking['timeUntilStart'] = {
-                        'days': time_until_start.days,
-                        'hours': time_until_start.seconds // 3600,
-                        'minutes': (time_until_start.seconds % 3600) // 60
-                    }
-                else:
-                    booking['timeUntilStart'] = None
-                
-                # Calculate if booking is active, upcoming, or past
-                if current_time < start_datetime:
-                    booking['bookingState'] = 'upcoming'
-                elif start_datetime <= current_time <= end_datetime:
-                    booking['bookingState'] = 'active'
-                else:
-                    booking['bookingState'] = 'past'
-                
-                # Calculate remaining time for active bookings
-                if booking['bookingState'] == 'active':
-                    remaining_time = end_datetime - current_time
-                    booking['remainingTime'] = {
-                        'hours': remaining_time.seconds // 3600,
-                        'minutes': (remaining_time.seconds % 3600) // 60
-                    }
-                else:
-                    booking['remainingTime'] = None
-                    
-            except ValueError as e:
-                logger.warning(f"Error calculating time fields for booking {booking_id}: {str(e)}")
-                booking['timeUntilStart'] = None
-                booking['bookingState'] = 'unknown'
-                booking['remainingTime'] = None
+            # Format the booking details, with bookingState, timeUntilStart and remainingTime
+            booking = Booking.from_dynamo(booking_item).to_api(derived=True)
             
             logger.info(f"Retrieved booking details for {booking_id}")
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'booking': booking,
-                    'userEmail': user_email,
-                    'isAdmin': is_admin
-                })
-            }
+            return respond(200, {
+                'booking': booking,
+                'userEmail': user_email,
+                'isAdmin': is_admin
+            }, ALLOWED_METHODS)
             
         except Exception as e:
             logger.error(f"Error retrieving booking details: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error retrieving booking details'
-                })
-            }
+            return respond(500, {'error': 'Error retrieving booking details'}, ALLOWED_METHODS)
             
     except Exception as e:
         logger.error(f"Unexpected error in get_booking_details_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, ALLOWED_METHODS) 
\ No newline at end of file
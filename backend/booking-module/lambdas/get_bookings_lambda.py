@@ -1,17 +1,92 @@
-import json
-import boto3
 import os
-from datetime import datetime
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from booking_common import dynamodb, respond, extract_user, Booking, derive_booking_states, ADMIN_GROUP
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 
+ALLOWED_METHODS = 'GET,OPTIONS'
+
+# Number of parallel segments used for admin table scans
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+
+def created_at(item):
+    return item.get('createdAt', {}).get('S', '')
+
+def latest_bookings(limit, status_filter=None):
+    """
+    Read the newest bookings fleet-wide from the time-ordered CreatedAtIndex.
+    Without a status filter this reads exactly `limit` items.
+    """
+    query_params = {
+        'TableName': bookings_table,
+        'IndexName': 'CreatedAtIndex',
+        'KeyConditionExpression': 'recordType = :recordType',
+        'ExpressionAttributeValues': {
+            ':recordType': {'S': 'booking'}
+        },
+        'ScanIndexForward': False,  # Most recent first
+        'Limit': limit
+    }
+    if status_filter:
+        query_params['FilterExpression'] = '#status = :status'
+        query_params['ExpressionAttributeNames'] = {'#status': 'status'}
+        query_params['ExpressionAttributeValues'][':status'] = {'S': status_filter}
+    
+    items = []
+    while True:
+        response = dynamodb.query(**query_params)
+        items.extend(response.get('Items', []))
+        if len(items) >= limit or 'LastEvaluatedKey' not in response:
+            return items[:limit]
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def scan_segment(scan_params, segment, limit):
+    """
+    Scan one segment to completion, keeping only its newest `limit` items
+    """
+    params = dict(scan_params, Segment=segment, TotalSegments=SCAN_SEGMENTS)
+    newest = []
+    while True:
+        response = dynamodb.scan(**params)
+        for item in response.get('Items', []):
+            if len(newest) < limit:
+                heapq.heappush(newest, (created_at(item), item['bookingId']['S'], item))
+            else:
+                heapq.heappushpop(newest, (created_at(item), item['bookingId']['S'], item))
+        if 'LastEvaluatedKey' not in response:
+            break
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return [entry[2] for entry in sorted(newest, reverse=True)]
+
+def scan_bookings(limit, status_filter=None, date_filter=None):
+    """
+    Scan the whole bookings table with parallel segments and merge the
+    per-segment results into the newest `limit` bookings
+    """
+    scan_params = {'TableName': bookings_table}
+    filters = []
+    if status_filter:
+        filters.append('#status = :status')
+        scan_params['ExpressionAttributeNames'] = {'#status': 'status'}
+        scan_params.setdefault('ExpressionAttributeValues', {})[':status'] = {'S': status_filter}
+    if date_filter:
+        filters.append('begins_with(bookingDate, :date)')
+        scan_params.setdefault('ExpressionAttributeValues', {})[':date'] = {'S': date_filter}
+    if filters:
+        scan_params['FilterExpression'] = ' AND '.join(filters)
+    
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+        segments = list(executor.map(lambda segment: scan_segment(scan_params, segment, limit), range(SCAN_SEGMENTS)))
+    
+    merged = heapq.merge(*segments, key=created_at, reverse=True)
+    return [item for _, item in zip(range(limit), merged)]
+
 def lambda_handler(event, context):
     """
     Get bookings for a user with optional filtering
@@ -20,73 +95,28 @@ def lambda_handler(event, context):
     try:
         # Extract user info from Cognito claims
         try:
-            # Debug the authorizer structure
-            logger.info(f"Full event structure: {json.dumps(event, default=str)}")
-            
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            logger.info(f"Authorizer structure: {json.dumps(authorizer, default=str)}")
+            user_id, user_email, user_groups = extract_user(event)
+            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
             
-            # For API Gateway v2 with JWT authorizer, claims are directly in the authorizer
-            # The structure is: authorizer.jwt.claims
-            if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
-                claims = authorizer['jwt']['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-                logger.info(f"Extracted from jwt.claims - user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
-            elif 'claims' in authorizer:
-                # Fallback for different authorizer structure
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-                logger.info(f"Extracted from claims - user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
-            else:
-                # Last resort: try to extract from authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                logger.info(f"Extracted from authorizer directly - user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
-                
             # Validate that we got a real user ID
             if user_id == 'unknown':
                 logger.error("Failed to extract user ID from JWT claims")
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid authentication token - user ID not found'
-                    })
-                }
+                return respond(401, {'error': 'Invalid authentication token - user ID not found'}, ALLOWED_METHODS)
             
         except (KeyError, TypeError) as e:
             logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+            return respond(401, {'error': 'Invalid authentication token'}, ALLOWED_METHODS)
         
         # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        is_admin = ADMIN_GROUP in user_groups
         
         # Parse query parameters
         query_params = event.get('queryStringParameters', {}) or {}
         status_filter = query_params.get('status')
         date_filter = query_params.get('date')
         limit = int(query_params.get('limit', 50))
+        # Admins can force a full table scan, e.g. for bookings that predate CreatedAtIndex
+        full_scan = query_params.get('mode') == 'scan'
         
         # Build query parameters
         query_params_dynamo = {
@@ -122,108 +152,43 @@ def lambda_handler(event, context):
         
         # If admin, get all bookings instead of user-specific
         if is_admin:
-            # Remove user-specific query and use scan instead
-            scan_params = {
-                'TableName': bookings_table,
-                'Limit': limit
-            }
-            
-            if status_filter:
-                scan_params['FilterExpression'] = '#status = :status'
-                scan_params['ExpressionAttributeNames'] = {
-                    '#status': 'status'
-                }
-                scan_params['ExpressionAttributeValues'] = {
-                    ':status': {'S': status_filter}
-                }
-            
+            # Latest bookings come from the time-ordered index; a date filter
+            # is not part of that index, so it falls back to a parallel scan
             try:
-                response = dynamodb.scan(**scan_params)
+                if date_filter or full_scan:
+                    items = scan_bookings(limit, status_filter, date_filter)
+                else:
+                    items = latest_bookings(limit, status_filter)
+                response = {'Items': items}
             except Exception as e:
                 logger.error(f"Error scanning bookings for admin: {str(e)}")
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Error retrieving bookings'
-                    })
-                }
+                return respond(500, {'error': 'Error retrieving bookings'}, ALLOWED_METHODS)
         else:
             # Regular user query
             try:
                 response = dynamodb.query(**query_params_dynamo)
             except Exception as e:
                 logger.error(f"Error querying bookings: {str(e)}")
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Error retrieving bookings'
-                    })
-                }
+                return respond(500, {'error': 'Error retrieving bookings'}, ALLOWED_METHODS)
         
         # Process and format bookings
-        bookings = []
-        for item in response.get('Items', []):
-            booking = {
-                'bookingId': item['bookingId']['S'],
-                'userId': item['userId']['S'],
-                'userEmail': item.get('userEmail', {}).get('S', ''),
-                'bikeId': item['bikeId']['S'],
-                'startDate': item['startDate']['S'],
-                'endDate': item['endDate']['S'],
-                'duration': int(item['duration']['N']),
-                'status': item['status']['S'],
-                'notes': item.get('notes', {}).get('S', ''),
-                'createdAt': item['createdAt']['S'],
-                'updatedAt': item.get('updatedAt', {}).get('S', ''),
-                'bikeModel': item.get('bikeModel', {}).get('S', 'Unknown'),
-                'bikeType': item.get('bikeType', {}).get('S', 'Unknown')
-            }
-            bookings.append(booking)
+        # Derived fields (bookingState, timeUntilStart, remainingTime) are
+        # computed for the whole page at once
+        records = derive_booking_states([Booking.from_dynamo(item) for item in response.get('Items', [])])
+        bookings = [record.to_api(derived=True) for record in records]
         
         # Sort bookings by creation date (newest first)
         bookings.sort(key=lambda x: x['createdAt'], reverse=True)
         
         logger.info(f"Retrieved {len(bookings)} bookings for user {user_id}")
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'bookings': bookings,
-                'count': len(bookings),
-                'userEmail': user_email,
-                'isAdmin': is_admin
-            })
-        }
+        return respond(200, {
+            'bookings': bookings,
+            'count': len(bookings),
+            'userEmail': user_email,
+            'isAdmin': is_admin
+        }, ALLOWED_METHODS)
         
     except Exception as e:
         logger.error(f"Unexpected error in get_bookings_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, ALLOWED_METHODS) 
\ No newline at end of file
@@ -1,17 +1,21 @@
 import json
-import boto3
 import os
 from datetime import datetime
 import logging
+from booking_common import (
+    dynamodb, respond, extract_user, parse_date, parse_duration, booking_slots, reschedule_slot_writes,
+    held_slots, conflicting_claim, write_slot_requests, bump_slot_generation,
+    ADMIN_GROUP, SLOT_MINUTES, MAX_SLOTS, MAX_TRANSACTION_ITEMS
+)
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 
+ALLOWED_METHODS = 'PUT,OPTIONS'
+
 def lambda_handler(event, context):
     """
     Update an existing booking
@@ -25,78 +29,27 @@ def lambda_handler(event, context):
         
         # Extract user info from Cognito claims
         try:
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
+            user_id, user_email, user_groups = extract_user(event)
+            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
             
-            # For API Gateway v2 with JWT authorizer, claims are directly in the authorizer
-            # The structure is: authorizer.jwt.claims
-            if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
-                claims = authorizer['jwt']['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'claims' in authorizer:
-                # Fallback for different authorizer structure
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            else:
-                # Last resort: try to extract from authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
             # Validate that we got a real user ID
             if user_id == 'unknown':
                 logger.error("Failed to extract user ID from JWT claims")
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid authentication token - user ID not found'
-                    })
-                }
+                return respond(401, {'error': 'Invalid authentication token - user ID not found'}, ALLOWED_METHODS)
                 
         except (KeyError, TypeError) as e:
             logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+            return respond(401, {'error': 'Invalid authentication token'}, ALLOWED_METHODS)
         
         # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        is_admin = ADMIN_GROUP in user_groups
         
         # Get booking ID from path parameters
         path_params = event.get('pathParameters', {}) or {}
         booking_id = path_params.get('bookingId')
         
         if not booking_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Booking ID is required'
-                })
-            }
+            return respond(400, {'error': 'Booking ID is required'}, ALLOWED_METHODS)
         
         # Get the existing booking
         try:
@@ -106,66 +59,22 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in booking_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking not found'
-                    })
-                }
+                return respond(404, {'error': 'Booking not found'}, ALLOWED_METHODS)
             
             existing_booking = booking_response['Item']
             
             # Check if user owns this booking (unless admin)
             if not is_admin and existing_booking['userId']['S'] != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'You can only update your own bookings'
-                    })
-                }
+                return respond(403, {'error': 'You can only update your own bookings'}, ALLOWED_METHODS)
             
             # Check if booking can be updated (not cancelled or completed)
             booking_status = existing_booking['status']['S']
             if booking_status in ['cancelled', 'completed']:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': f'Cannot update booking with status: {booking_status}'
-                    })
-                }
+                return respond(400, {'error': f'Cannot update booking with status: {booking_status}'}, ALLOWED_METHODS)
                 
         except Exception as e:
             logger.error(f"Error retrieving booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error retrieving booking'
-                })
-            }
+            return respond(500, {'error': 'Error retrieving booking'}, ALLOWED_METHODS)
         
         # Prepare update expression and attribute values
         update_expression = "SET "
@@ -183,48 +92,21 @@ def lambda_handler(event, context):
                 # Validate dates if updating
                 if field in ['startDate', 'endDate']:
                     try:
-                        field_datetime = datetime.fromisoformat(field_value.replace('Z', '+00:00'))
+                        field_datetime = parse_date(field_value)
                         if field == 'startDate' and field_datetime < datetime.now().replace(tzinfo=field_datetime.tzinfo):
-                            return {
-                                'statusCode': 400,
-                                'headers': {
-                                    'Content-Type': 'application/json',
-                                    'Access-Control-Allow-Origin': '*',
-                                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                                },
-                                'body': json.dumps({
-                                    'error': 'Start date cannot be in the past'
-                                })
-                            }
+                            return respond(400, {'error': 'Start date cannot be in the past'}, ALLOWED_METHODS)
                     except ValueError:
-                        return {
-                            'statusCode': 400,
-                            'headers': {
-                                'Content-Type': 'application/json',
-                                'Access-Control-Allow-Origin': '*',
-                                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                                'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                            },
-                            'body': json.dumps({
-                                'error': f'Invalid date format for {field}'
-                            })
-                        }
+                        return respond(400, {'error': f'Invalid date format for {field}'}, ALLOWED_METHODS)
+                
+                # Validate duration if updating
+                if field == 'duration':
+                    field_value = parse_duration(field_value)
+                    if field_value is None:
+                        return respond(400, {'error': 'Duration must be a positive whole number of hours'}, ALLOWED_METHODS)
                 
                 # Validate status if updating
                 if field == 'status' and field_value not in ['active', 'cancelled', 'completed']:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                            'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                        },
-                        'body': json.dumps({
-                            'error': 'Invalid status. Must be active, cancelled, or completed'
-                        })
-                    }
+                    return respond(400, {'error': 'Invalid status. Must be active, cancelled, or completed'}, ALLOWED_METHODS)
                 
                 # Add to update expression
                 attr_name = f"#{field}"
@@ -252,61 +134,108 @@ def lambda_handler(event, context):
             expression_attribute_names["#bookingDate"] = "bookingDate"
             expression_attribute_values[":bookingDate"] = {'S': body['startDate'].split('T')[0]}
         
+        # Moving the window (or leaving 'active') moves the booking's slot claims
+        bike_id = existing_booking['bikeId']['S']
+        old_start = existing_booking['startDate']['S']
+        old_end = existing_booking['endDate']['S']
+        new_start = body.get('startDate', old_start)
+        new_end = body.get('endDate', old_end)
+        new_status = body.get('status', booking_status)
+        moves_slots = 'startDate' in body or 'endDate' in body or new_status != 'active'
+        
         try:
-            # Perform the update
-            dynamodb.update_item(
-                TableName=bookings_table,
-                Key={'bookingId': {'S': booking_id}},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values
-            )
+            if moves_slots:
+                new_end_datetime = parse_date(new_end)
+                new_slots = booking_slots(parse_date(new_start), new_end_datetime) if new_status == 'active' else []
+                if new_status == 'active' and not new_slots:
+                    return respond(400, {'error': 'Start date must be before end date'}, ALLOWED_METHODS)
+                if len(new_slots) > MAX_SLOTS:
+                    return respond(400, {'error': f'Bookings cannot be longer than {MAX_SLOTS * SLOT_MINUTES // 60} hours'}, ALLOWED_METHODS)
+                
+                # Release only the old slots this booking actually holds: a legacy
+                # double-booking may have lost some of them to the other booking
+                old_slots = held_slots(bike_id, booking_id, booking_slots(parse_date(old_start), parse_date(old_end)))
+                claims, releases = reschedule_slot_writes(
+                    bike_id, booking_id, new_start, new_end,
+                    new_slots, old_slots,
+                    int(new_end_datetime.timestamp())
+                )
+                
+                # Only apply the update to the booking as it was read
+                expression_attribute_names.update({'#startDate': 'startDate', '#endDate': 'endDate', '#status': 'status'})
+                expression_attribute_values.update({
+                    ':expectedStart': {'S': old_start},
+                    ':expectedEnd': {'S': old_end},
+                    ':expectedStatus': {'S': booking_status}
+                })
+                transact_items = [
+                    {
+                        'Update': {
+                            'TableName': bookings_table,
+                            'Key': {'bookingId': {'S': booking_id}},
+                            'UpdateExpression': update_expression,
+                            'ConditionExpression': '#startDate = :expectedStart AND #endDate = :expectedEnd AND #status = :expectedStatus',
+                            'ExpressionAttributeNames': expression_attribute_names,
+                            'ExpressionAttributeValues': expression_attribute_values
+                        }
+                    }
+                ] + claims
+                
+                # The update and the new claims always fit in one transaction, like
+                # a create. Releases of the old window ride along when they fit;
+                # otherwise they are deleted right after, which is safe because
+                # no other booking can claim a slot this booking still holds.
+                if len(transact_items) + len(releases) <= MAX_TRANSACTION_ITEMS:
+                    transact_items += releases
+                    releases = []
+                
+                dynamodb.transact_write_items(TransactItems=transact_items)
+                
+                try:
+                    if releases:
+                        write_slot_requests([
+                            {'DeleteRequest': {'Key': release['Delete']['Key']}} for release in releases
+                        ])
+                    bump_slot_generation(bike_id)
+                except Exception as e:
+                    logger.error(f"Error releasing old slots for booking {booking_id}: {str(e)}")
+            else:
+                dynamodb.update_item(
+                    TableName=bookings_table,
+                    Key={'bookingId': {'S': booking_id}},
+                    UpdateExpression=update_expression,
+                    ExpressionAttributeNames=expression_attribute_names,
+                    ExpressionAttributeValues=expression_attribute_values
+                )
             
             logger.info(f"Booking {booking_id} updated successfully")
             
             # Return the updated booking
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'message': 'Booking updated successfully',
-                    'bookingId': booking_id,
-                    'updatedFields': updated_fields,
-                    'updatedAt': current_time
-                })
-            }
+            return respond(200, {
+                'message': 'Booking updated successfully',
+                'bookingId': booking_id,
+                'updatedFields': updated_fields,
+                'updatedAt': current_time
+            }, ALLOWED_METHODS)
+            
+        except dynamodb.exceptions.TransactionCanceledException as e:
+            conflicting_slot = conflicting_claim(e)
+            if conflicting_slot is not None:
+                return respond(409, {
+                    'error': 'Bike is already booked for this time period',
+                    'conflictingBooking': {
+                        'startDate': conflicting_slot['startDate']['S'],
+                        'endDate': conflicting_slot['endDate']['S']
+                    }
+                }, ALLOWED_METHODS)
+            
+            logger.error(f"Reschedule transaction cancelled: {str(e)}")
+            return respond(409, {'error': 'Booking was changed by another request, please try again'}, ALLOWED_METHODS)
             
         except Exception as e:
             logger.error(f"Error updating booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error updating booking'
-                })
-            }
+            return respond(500, {'error': 'Error updating booking'}, ALLOWED_METHODS)
             
     except Exception as e:
         logger.error(f"Unexpected error in update_booking_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, ALLOWED_METHODS) 
\ No newline at end of file
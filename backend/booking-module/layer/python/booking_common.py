@@ -0,0 +1,491 @@
+"""
+Shared runtime for the booking Lambdas (deployed as the DALScooterBookingCommon layer)
+
+Provides the AWS clients, JWT claim parsing, API responses and the helpers for
+the per-bike slot index used by the create, update and cancel handlers.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+import boto3
+from botocore.config import Config
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:  # optional: install it into layer/python to enable the fast path
+    orjson = None
+
+# One tuned client configuration shared by every booking handler:
+# keep connections alive between warm invocations, size the pool for the
+# thread pools used by admin scans, and let botocore retry throttles adaptively
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=int(os.environ.get('MAX_POOL_CONNECTIONS', '16')),
+    connect_timeout=2,
+    read_timeout=5,
+    retries={'mode': 'adaptive', 'max_attempts': 4}
+)
+
+_session = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service_name):
+    """
+    Return the container's client for an AWS service, building it on first use.
+    Clients are memoized per container, so a handler only pays for the
+    services it actually calls (e.g. SNS only when a notification is sent).
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        global _session
+        # Admin scans call in from worker threads; build each client only once
+        with _clients_lock:
+            client = _clients.get(service_name)
+            if client is None:
+                if _session is None:
+                    _session = boto3.session.Session()
+                client = _session.client(service_name, config=BOTO_CONFIG)
+                _clients[service_name] = client
+    return client
+
+# Every booking handler reads DynamoDB, so build it during the init phase
+dynamodb = get_client('dynamodb')
+
+SLOTS_TABLE = os.environ.get('SLOTS_TABLE', 'DALScooterBikeSlots')
+
+# Width of one reservation slot in the per-bike interval index
+SLOT_MINUTES = 15
+# Sort key of the per-bike generation counter kept beside the slots; it sorts
+# before every slot key, so slot range queries never see it
+GENERATION_KEY = '#generation'
+# TransactWriteItems accepts 100 actions: the booking itself, the bike version
+# check and the slot claims
+MAX_TRANSACTION_ITEMS = 100
+MAX_SLOTS = MAX_TRANSACTION_ITEMS - 2
+# BatchWriteItem accepts 25 requests; unprocessed ones are retried with full
+# jitter, doubling from BACKOFF_BASE up to BACKOFF_MAX seconds
+BATCH_SIZE = 25
+BATCH_WRITE_ATTEMPTS = 6
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 2.0
+
+# Group whose members can see and manage every booking
+ADMIN_GROUP = 'BikeFranchise'
+
+BASE_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization'
+}
+
+# Booking attributes returned by the API: (name, DynamoDB type, default).
+# A default of None marks a required attribute.
+BOOKING_SCHEMA = (
+    ('bookingId', 'S', None),
+    ('userId', 'S', None),
+    ('userEmail', 'S', ''),
+    ('bikeId', 'S', None),
+    ('startDate', 'S', None),
+    ('endDate', 'S', None),
+    ('duration', 'N', None),
+    ('status', 'S', None),
+    ('notes', 'S', ''),
+    ('createdAt', 'S', None),
+    ('updatedAt', 'S', ''),
+    ('bikeModel', 'S', 'Unknown'),
+    ('bikeType', 'S', 'Unknown'),
+)
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(body):
+    """
+    Serialize a response body compactly, with orjson when it is bundled in the
+    layer and the standard library otherwise. Bookings arrive as plain Python
+    values (Booking.from_dynamo converts each row once), so the Decimal hook
+    is only a fallback for other callers.
+    """
+    if orjson is not None:
+        return orjson.dumps(body, default=_json_default).decode()
+    return json.dumps(body, default=_json_default, separators=(',', ':'))
+
+def respond(status_code, body, methods):
+    """
+    Build an API Gateway response with the booking API's CORS headers
+    """
+    return {
+        'statusCode': status_code,
+        'headers': dict(BASE_HEADERS, **{'Access-Control-Allow-Methods': methods}),
+        'body': dumps(body)
+    }
+
+def extract_user(event):
+    """
+    Return (user_id, user_email, user_groups) from the Cognito claims.
+    For API Gateway v2 with a JWT authorizer the claims are in authorizer.jwt.claims;
+    authorizer.claims and claims placed directly on the authorizer are also accepted.
+    A missing user ID is returned as 'unknown'.
+    """
+    authorizer = event.get('requestContext', {}).get('authorizer', {})
+    if 'jwt' in authorizer and 'claims' in authorizer['jwt']:
+        claims = authorizer['jwt']['claims']
+    elif 'claims' in authorizer:
+        claims = authorizer['claims']
+    else:
+        claims = authorizer
+    return (
+        claims.get('sub', 'unknown'),
+        claims.get('email', 'unknown@example.com'),
+        claims.get('cognito:groups', '')
+    )
+
+def parse_date(value):
+    """
+    Parse an ISO 8601 date/time, accepting a trailing 'Z'
+    """
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def parse_duration(value):
+    """
+    Return a booking duration in whole hours as an int, or None if the value
+    is not a positive whole number (bookings store it as a DynamoDB number)
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        hours = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    if not hours.is_finite() or hours < 1 or hours != hours.to_integral_value():
+        return None
+    return int(hours)
+
+def _number(value):
+    # Durations are whole hours, but rows written before they were validated may not be
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)
+        return int(number) if number.is_integer() else number
+
+# The booking codec, built once from BOOKING_SCHEMA: per attribute its name,
+# DynamoDB type, number converter (None for strings) and default
+_BOOKING_READERS = tuple(
+    (name, type_key, _number if type_key == 'N' else None, default)
+    for name, type_key, default in BOOKING_SCHEMA
+)
+_BOOKING_FIELDS = tuple(name for name, _, _ in BOOKING_SCHEMA)
+_booking_values = attrgetter(*_BOOKING_FIELDS)
+
+class Booking:
+    """
+    A booking record with one slot per BOOKING_SCHEMA attribute.
+
+    Converting a listing costs one object and one dict per item. bookingState,
+    timeUntilStart and remainingTime are computed on first access and cached.
+    """
+    __slots__ = tuple(name for name, _, _ in BOOKING_SCHEMA) + ('_derived',)
+
+    @classmethod
+    def from_dynamo(cls, item):
+        """
+        Build a record from a low-level DynamoDB item. Missing optional
+        attributes take their schema default; a missing required one raises KeyError.
+        """
+        booking = object.__new__(cls)
+        for name, type_key, convert, default in _BOOKING_READERS:
+            attribute = item.get(name)
+            if attribute is not None:
+                value = attribute[type_key]
+                setattr(booking, name, value if convert is None else convert(value))
+            elif default is None:
+                raise KeyError(name)
+            else:
+                setattr(booking, name, default)
+        booking._derived = None
+        return booking
+
+    def _fields_dict(self):
+        return dict(zip(_BOOKING_FIELDS, _booking_values(self)))
+
+    def _derive(self):
+        if self._derived is None:
+            self._derived = _booking_state(self.startDate, self.endDate, _epoch_us(datetime.now(timezone.utc)))
+        return self._derived
+
+    @property
+    def booking_state(self):
+        return self._derive()[0]
+
+    @property
+    def time_until_start(self):
+        return self._derive()[1]
+
+    @property
+    def remaining_time(self):
+        return self._derive()[2]
+
+    def to_api(self, derived=False):
+        """
+        Return the API representation; with derived=True it also carries
+        bookingState, timeUntilStart and remainingTime
+        """
+        body = self._fields_dict()
+        if derived:
+            body['bookingState'], body['timeUntilStart'], body['remainingTime'] = self._derive()
+        return body
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _epoch_us(moment):
+    """
+    Microseconds since the epoch; naive timestamps are taken as UTC (the Lambda clock)
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def _booking_state(start_date, end_date, now_us):
+    """
+    Return (bookingState, timeUntilStart, remainingTime) for a booking window
+    at now_us. Timestamps are compared as integer microseconds, with naive ones
+    taken as UTC, so the detail and list views always agree.
+    """
+    try:
+        start_us, end_us = _epoch_us(parse_date(start_date)), _epoch_us(parse_date(end_date))
+    except (ValueError, TypeError):
+        return ('unknown', None, None)
+
+    if now_us < start_us:
+        until = (start_us - now_us) // 1000000
+        return ('upcoming', {
+            'days': until // 86400,
+            'hours': until % 86400 // 3600,
+            'minutes': until % 3600 // 60
+        }, None)
+    if now_us <= end_us:
+        left = (end_us - now_us) // 1000000
+        return ('active', None, {
+            'hours': left % 86400 // 3600,
+            'minutes': left % 3600 // 60
+        })
+    return ('past', None, None)
+
+def derive_booking_states(bookings, now=None):
+    """
+    Fill the derived fields of a whole page of Booking records against a
+    single clock reading, so every record on the page is judged at the same instant
+    """
+    now_us = _epoch_us(now or datetime.now(timezone.utc))
+    for booking in bookings:
+        booking._derived = _booking_state(booking.startDate, booking.endDate, now_us)
+    return bookings
+
+def booking_slots(start_datetime, end_datetime):
+    """
+    Return the UTC slot keys covered by the half-open window [start, end)
+    """
+    start_utc = start_datetime.astimezone(timezone.utc)
+    end_utc = end_datetime.astimezone(timezone.utc)
+    slot = start_utc.replace(minute=start_utc.minute - start_utc.minute % SLOT_MINUTES, second=0, microsecond=0)
+    slots = []
+    while slot < end_utc:
+        slots.append(slot.strftime('%Y-%m-%dT%H:%MZ'))
+        slot += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+def slot_claims(bike_id, booking_id, start_date, end_date, slots, expires_at):
+    """
+    Build the conditional slot claims for a TransactWriteItems request.
+    Each claim only succeeds if no other booking holds the slot.
+    """
+    return [
+        {
+            'Put': {
+                'TableName': SLOTS_TABLE,
+                'Item': {
+                    'bikeId': {'S': bike_id},
+                    'slotStart': {'S': slot},
+                    'bookingId': {'S': booking_id},
+                    'startDate': {'S': start_date},
+                    'endDate': {'S': end_date},
+                    'expiresAt': {'N': str(expires_at)}
+                },
+                'ConditionExpression': 'attribute_not_exists(slotStart)',
+                'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+            }
+        }
+        for slot in slots
+    ]
+
+def conflicting_claim(error):
+    """
+    Return the slot item that made a booking transaction fail, or None if it
+    was cancelled for another reason
+    """
+    for reason in error.response.get('CancellationReasons', []):
+        if reason.get('Code') == 'ConditionalCheckFailed' and 'slotStart' in reason.get('Item', {}):
+            return reason['Item']
+    return None
+
+class TTLCache:
+    """
+    Bounded in-container cache. Entries expire `ttl` seconds after they were
+    stored and the least recently used entry is evicted beyond `maxsize`.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def batch_write(table_name, requests, max_attempts=BATCH_WRITE_ATTEMPTS):
+    """
+    Send put/delete requests with BatchWriteItem, 25 at a time. Unprocessed
+    items are retried with jittered exponential backoff; a RuntimeError is
+    raised if some are still unprocessed after max_attempts.
+    """
+    for i in range(0, len(requests), BATCH_SIZE):
+        pending = {table_name: requests[i:i + BATCH_SIZE]}
+        for attempt in range(max_attempts):
+            result = dynamodb.batch_write_item(RequestItems=pending)
+            pending = result.get('UnprocessedItems') or {}
+            if not pending:
+                break
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+        else:
+            raise RuntimeError(
+                f'{len(pending.get(table_name, []))} request(s) to {table_name} unprocessed after {max_attempts} attempts'
+            )
+
+def write_slot_requests(requests):
+    """
+    Send slot index put/delete requests with BatchWriteItem
+    """
+    batch_write(SLOTS_TABLE, requests)
+
+def bump_slot_generation(bike_id):
+    """
+    Advance the bike's generation counter after its slots changed. The bike
+    module caches availability answers per generation, so this invalidates them.
+    """
+    dynamodb.update_item(
+        TableName=SLOTS_TABLE,
+        Key={'bikeId': {'S': bike_id}, 'slotStart': {'S': GENERATION_KEY}},
+        UpdateExpression='ADD generation :step',
+        ExpressionAttributeValues={':step': {'N': '1'}}
+    )
+
+def iter_claims(bike_id, slots, projection='bikeId, slotStart, bookingId, startDate, endDate'):
+    """
+    Yield the claimed slots of a bike inside [slots[0], slots[-1]], following
+    LastEvaluatedKey to the end of the range. The key condition bounds the read
+    to the requested window, so it never touches the rest of the bike's history;
+    callers that only need the first match simply stop iterating.
+    """
+    query_params = {
+        'TableName': SLOTS_TABLE,
+        'KeyConditionExpression': 'bikeId = :bikeId AND slotStart BETWEEN :firstSlot AND :lastSlot',
+        'ExpressionAttributeValues': {
+            ':bikeId': {'S': bike_id},
+            ':firstSlot': {'S': slots[0]},
+            ':lastSlot': {'S': slots[-1]}
+        },
+        'ProjectionExpression': projection
+    }
+    while True:
+        response = dynamodb.query(**query_params)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def held_slots(bike_id, booking_id, slots):
+    """
+    Return the slots of `slots` that are claimed by this booking. Bookings that
+    were double-booked before the slot index existed don't hold the slots the
+    other booking claimed first (the backfill reports them as 'conflict'), so
+    releases are built from this instead of from the booking's window.
+    """
+    if not slots:
+        return []
+    wanted = set(slots)
+    return [
+        claim['slotStart']['S']
+        for claim in iter_claims(bike_id, slots, projection='slotStart, bookingId')
+        if claim['slotStart']['S'] in wanted and claim.get('bookingId', {}).get('S') == booking_id
+    ]
+
+def reschedule_slot_writes(bike_id, booking_id, start_date, end_date, new_slots, old_slots, expires_at):
+    """
+    Build the transaction actions that move a booking's claims from old_slots
+    to new_slots: a Put for every new slot and a Delete for every old slot the
+    booking no longer covers. Both only succeed if the slot is free or already
+    held by this booking, so overlapping windows reuse their own claims.
+    Returns (claims, releases).
+    """
+    own_or_free = {
+        'ConditionExpression': 'attribute_not_exists(slotStart) OR bookingId = :bookingId',
+        'ExpressionAttributeValues': {':bookingId': {'S': booking_id}}
+    }
+    claims = []
+    for claim in slot_claims(bike_id, booking_id, start_date, end_date, new_slots, expires_at):
+        claim['Put'].update(own_or_free)
+        claims.append(claim)
+    kept = set(new_slots)
+    releases = [
+        {
+            'Delete': dict(
+                {'TableName': SLOTS_TABLE, 'Key': {'bikeId': {'S': bike_id}, 'slotStart': {'S': slot}}},
+                **own_or_free
+            )
+        }
+        for slot in old_slots if slot not in kept
+    ]
+    return claims, releases
+
+def slot_releases(bike_id, booking_id, start_date, end_date):
+    """
+    Build the transaction actions that delete a booking's claims. Only slots
+    this booking holds are released, and each Delete is conditional on that, so
+    it never frees (or fails on) another booking's slot.
+    """
+    slots = held_slots(bike_id, booking_id, booking_slots(parse_date(start_date), parse_date(end_date)))
+    return reschedule_slot_writes(bike_id, booking_id, start_date, end_date, [], slots, 0)[1]
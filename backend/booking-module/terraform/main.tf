@@ -9,6 +9,8 @@ resource "aws_dynamodb_table" "bookings_table" {
   name           = "DALScooterBookings"
   billing_mode   = "PAY_PER_REQUEST"
   hash_key       = "bookingId"
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
 
   attribute {
     name = "bookingId"
@@ -30,6 +32,16 @@ resource "aws_dynamodb_table" "bookings_table" {
     type = "S"
   }
 
+  attribute {
+    name = "recordType"
+    type = "S"
+  }
+
+  attribute {
+    name = "createdAt"
+    type = "S"
+  }
+
   # Global Secondary Index for user bookings
   global_secondary_index {
     name            = "UserBookingsIndex"
@@ -46,6 +58,44 @@ resource "aws_dynamodb_table" "bookings_table" {
     projection_type = "ALL"
   }
 
+  # Global Secondary Index for fleet-wide listings, newest first
+  global_secondary_index {
+    name            = "CreatedAtIndex"
+    hash_key        = "recordType"
+    range_key       = "createdAt"
+    projection_type = "ALL"
+  }
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+    Module      = "Booking"
+  }
+}
+
+# DynamoDB Table for the per-bike interval index (one item per claimed slot)
+resource "aws_dynamodb_table" "bike_slots_table" {
+  name           = "DALScooterBikeSlots"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "bikeId"
+  range_key      = "slotStart"
+
+  attribute {
+    name = "bikeId"
+    type = "S"
+  }
+
+  attribute {
+    name = "slotStart"
+    type = "S"
+  }
+
+  # Claims expire once the booking has ended, so the index only holds live reservations
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
   tags = {
     Environment = "dev"
     Project     = "DALScooter"
@@ -84,12 +134,83 @@ data "archive_file" "get_booking_details_zip" {
   output_path = "${path.module}/../lambdas/get_booking_details_lambda.zip"
 }
 
+data "archive_file" "backfill_booking_slots_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/backfill_booking_slots.py"
+  output_path = "${path.module}/../lambdas/backfill_booking_slots.zip"
+}
+
+data "archive_file" "booking_layer_zip" {
+  type        = "zip"
+  source_dir  = "${path.module}/../layer"
+  output_path = "${path.module}/../booking_common_layer.zip"
+}
+
+# Shared helpers (clients, responses, slot claims) for the booking Lambdas
+resource "aws_lambda_layer_version" "booking_common" {
+  layer_name          = "DALScooterBookingCommon"
+  filename            = data.archive_file.booking_layer_zip.output_path
+  source_code_hash    = data.archive_file.booking_layer_zip.output_base64sha256
+  compatible_runtimes = ["python3.11"]
+}
+
+# One-off backfill of DALScooterBikeSlots and recordType for the bookings that already exist
+resource "aws_lambda_function" "backfill_booking_slots_lambda" {
+  function_name = "DALScooterBackfillBookingSlotsLambda"
+  filename      = data.archive_file.backfill_booking_slots_zip.output_path
+  handler       = "backfill_booking_slots.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 900
+  source_code_hash = data.archive_file.backfill_booking_slots_zip.output_base64sha256
+
+  environment {
+    variables = {
+      BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      SLOTS_TABLE = aws_dynamodb_table.bike_slots_table.name
+    }
+  }
+
+  depends_on = [data.archive_file.backfill_booking_slots_zip]
+}
+
+# The slot-based handlers only see conflicts through the slot index, and the
+# admin listing only sees bookings with a recordType, so the backfill runs
+# before they are deployed...
+resource "aws_lambda_invocation" "backfill_booking_slots_before" {
+  function_name = aws_lambda_function.backfill_booking_slots_lambda.function_name
+  input         = jsonencode({ phase = "before" })
+
+  triggers = {
+    slots_table = aws_dynamodb_table.bike_slots_table.arn
+  }
+}
+
+# ...and once more after, for bookings the old handlers made in between
+resource "aws_lambda_invocation" "backfill_booking_slots_after" {
+  function_name = aws_lambda_function.backfill_booking_slots_lambda.function_name
+  input         = jsonencode({ phase = "after" })
+
+  triggers = {
+    slots_table = aws_dynamodb_table.bike_slots_table.arn
+  }
+
+  depends_on = [
+    aws_lambda_function.create_booking_lambda,
+    aws_lambda_function.get_bookings_lambda,
+    aws_lambda_function.update_booking_lambda,
+    aws_lambda_function.cancel_booking_lambda
+  ]
+}
+
 # Lambda Functions
 resource "aws_lambda_function" "create_booking_lambda" {
   function_name = "DALScooterCreateBookingLambda"
   filename      = data.archive_file.create_booking_zip.output_path
   handler       = "create_booking_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.create_booking_zip.output_base64sha256
@@ -98,11 +219,15 @@ resource "aws_lambda_function" "create_booking_lambda" {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
       BIKE_INVENTORY_TABLE = "BikeInventoryTable"
+      SLOTS_TABLE = aws_dynamodb_table.bike_slots_table.name
       SNS_TOPIC_ARN = var.sns_topic_arn
     }
   }
 
-  depends_on = [data.archive_file.create_booking_zip]
+  depends_on = [
+    data.archive_file.create_booking_zip,
+    aws_lambda_invocation.backfill_booking_slots_before
+  ]
   
   # Force update when source code changes
   tags = {
@@ -115,6 +240,7 @@ resource "aws_lambda_function" "get_bookings_lambda" {
   filename      = data.archive_file.get_bookings_zip.output_path
   handler       = "get_bookings_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.get_bookings_zip.output_base64sha256
@@ -125,7 +251,10 @@ resource "aws_lambda_function" "get_bookings_lambda" {
     }
   }
 
-  depends_on = [data.archive_file.get_bookings_zip]
+  depends_on = [
+    data.archive_file.get_bookings_zip,
+    aws_lambda_invocation.backfill_booking_slots_before
+  ]
   
   # Force update when source code changes
   tags = {
@@ -138,6 +267,7 @@ resource "aws_lambda_function" "update_booking_lambda" {
   filename      = data.archive_file.update_booking_zip.output_path
   handler       = "update_booking_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.update_booking_zip.output_base64sha256
@@ -145,10 +275,14 @@ resource "aws_lambda_function" "update_booking_lambda" {
   environment {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      SLOTS_TABLE = aws_dynamodb_table.bike_slots_table.name
     }
   }
 
-  depends_on = [data.archive_file.update_booking_zip]
+  depends_on = [
+    data.archive_file.update_booking_zip,
+    aws_lambda_invocation.backfill_booking_slots_before
+  ]
   
   # Force update when source code changes
   tags = {
@@ -161,6 +295,7 @@ resource "aws_lambda_function" "cancel_booking_lambda" {
   filename      = data.archive_file.cancel_booking_zip.output_path
   handler       = "cancel_booking_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.cancel_booking_zip.output_base64sha256
@@ -168,10 +303,14 @@ resource "aws_lambda_function" "cancel_booking_lambda" {
   environment {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      SLOTS_TABLE = aws_dynamodb_table.bike_slots_table.name
     }
   }
 
-  depends_on = [data.archive_file.cancel_booking_zip]
+  depends_on = [
+    data.archive_file.cancel_booking_zip,
+    aws_lambda_invocation.backfill_booking_slots_before
+  ]
   
   # Force update when source code changes
   tags = {
@@ -184,6 +323,7 @@ resource "aws_lambda_function" "get_booking_details_lambda" {
   filename      = data.archive_file.get_booking_details_zip.output_path
   handler       = "get_booking_details_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_common.arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.get_booking_details_zip.output_base64sha256
@@ -1,3 +1,7 @@
 output "booking_api_gateway_endpoint" {
   value = aws_apigatewayv2_api.booking_api.api_endpoint
+}
+
+output "bookings_table_stream_arn" {
+  value = aws_dynamodb_table.bookings_table.stream_arn
 }
\ No newline at end of file
@@ -0,0 +1,47 @@
+import boto3
+import os
+from boto3.dynamodb.conditions import Attr
+
+dynamodb = boto3.resource("dynamodb")
+logins_table_name = os.environ.get("LOGIN_TABLE_NAME", "UserLogins")
+logins_table = dynamodb.Table(logins_table_name)
+
+def stamp_login_date(item):
+    """Set login_date on one login, unless it was set since the scan read it"""
+    try:
+        logins_table.update_item(
+            Key={"user_id": item["user_id"], "login_timestamp": item["login_timestamp"]},
+            UpdateExpression="SET login_date = :login_date",
+            ConditionExpression="attribute_not_exists(login_date)",
+            ExpressionAttributeValues={":login_date": item["login_timestamp"][:10]}
+        )
+        return True
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def lambda_handler(event, context):
+    """
+    Set login_date (the LoginsByDateIndex partition key) on logins written
+    before it existed, so the recent-logins feed includes them. Deployment
+    runs it before get_user_count switches to the index; it is idempotent and
+    can be re-run. Stream consumers ignore the resulting MODIFY records.
+    """
+    scan_params = {
+        "FilterExpression": Attr("login_date").not_exists(),
+        "ProjectionExpression": "user_id, login_timestamp"
+    }
+    stamped = 0
+    while True:
+        response = logins_table.scan(**scan_params)
+        for item in response.get("Items", []):
+            if stamp_login_date(item):
+                stamped += 1
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    print(f"Backfilled login_date on {stamped} login(s)")
+    return {"statusCode": 200, "stamped": stamped}
+
+if __name__ == "__main__":
+    lambda_handler({}, None)
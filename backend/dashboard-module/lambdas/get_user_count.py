@@ -1,61 +1,60 @@
 import boto3
 import os
 import json
+from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
 
 dynamodb = boto3.resource("dynamodb")
-users_table_name = os.environ.get("DYNAMODB_TABLE_NAME", "DALScooterUsers")
 logins_table_name = os.environ.get("LOGIN_TABLE_NAME", "UserLogins")
-bookings_table_name = os.environ.get("BOOKINGS_TABLE_NAME", "DALScooterBookings")
-users_table = dynamodb.Table(users_table_name)
+stats_table_name = os.environ.get("STATS_TABLE_NAME", "DALScooterDashboardStats")
 logins_table = dynamodb.Table(logins_table_name)
-bookings_table = dynamodb.Table(bookings_table_name)
+stats_table = dynamodb.Table(stats_table_name)
 
-def lambda_handler(event, context):
-    try:
-        # Scan DALScooterUsers table for users with role = "user"
-        response = users_table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr("role").eq("user")
-        )
-        user_count = len(response.get("Items", []))
-
-        # Handle pagination for users
-        while 'LastEvaluatedKey' in response:
-            response = users_table.scan(
-                FilterExpression=boto3.dynamodb.conditions.Attr("role").eq("user"),
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            user_count += len(response.get("Items", []))
-
-        # Scan DALScooterBookings table for bookings with status = "active"
-        bookings_response = bookings_table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr("status").eq("active")
-        )
-        active_bookings_count = len(bookings_response.get("Items", []))
-
-        # Handle pagination for bookings
-        while 'LastEvaluatedKey' in bookings_response:
-            bookings_response = bookings_table.scan(
-                FilterExpression=boto3.dynamodb.conditions.Attr("status").eq("active"),
-                ExclusiveStartKey=bookings_response['LastEvaluatedKey']
-            )
-            active_bookings_count += len(bookings_response.get("Items", []))
+# Number of most recent logins returned in login_activity
+RECENT_LOGINS = 100
+# How many day buckets to walk back when looking for recent logins
+LOGIN_LOOKBACK_DAYS = int(os.environ.get("LOGIN_LOOKBACK_DAYS", "30"))
 
-        # Scan UserLogins table for login activity
-        login_response = logins_table.scan(
-            Limit=100  # Limit to 100 recent logins to avoid excessive data
-        )
-        login_items = login_response.get("Items", [])
+def latest_logins(limit):
+    """
+    Return the newest `limit` logins, walking the LoginsByDateIndex day
+    buckets backwards from today. Reads at most `limit` items, however
+    long the login history is.
+    """
+    items = []
+    day = datetime.utcnow().date()
+    for _ in range(LOGIN_LOOKBACK_DAYS):
+        query_params = {
+            "IndexName": "LoginsByDateIndex",
+            "KeyConditionExpression": Key("login_date").eq(day.isoformat()),
+            "ScanIndexForward": False  # Newest first
+        }
+        while len(items) < limit:
+            query_params["Limit"] = limit - len(items)
+            response = logins_table.query(**query_params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        if len(items) >= limit:
+            break
+        day -= timedelta(days=1)
+    return items[:limit]
 
-        # Handle pagination for logins
-        while 'LastEvaluatedKey' in login_response:
-            login_response = logins_table.scan(
-                Limit=100,
-                ExclusiveStartKey=login_response['LastEvaluatedKey']
-            )
-            login_items.extend(login_response.get("Items", []))
+def lambda_handler(event, context):
+    try:
+        # Counters are maintained by update_dashboard_stats from the table streams
+        stats = stats_table.get_item(Key={"statId": "dashboard"}).get("Item", {})
+        user_count = int(stats.get("total_users", 0))
+        active_bookings_count = int(stats.get("total_active_bookings", 0))
+        logins_per_day = {
+            key.split("#", 1)[1]: int(value)
+            for key, value in stats.items()
+            if key.startswith("logins#")
+        }
 
-        # Sort logins by timestamp (newest first)
-        login_items.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        # Most recent logins from the date-bucketed index
+        login_items = latest_logins(RECENT_LOGINS)
 
         # Format login activity for response
         login_activity = [
@@ -67,7 +66,7 @@ def lambda_handler(event, context):
                 "ipAddress": item.get("ipAddress"),
                 "userAgent": item.get("userAgent")
             }
-            for item in login_items[:100]  # Ensure we return at most 100 records
+            for item in login_items
         ]
 
         return {
@@ -81,6 +80,7 @@ def lambda_handler(event, context):
             "body": json.dumps({
                 "total_users": user_count,
                 "total_active_bookings": active_bookings_count,
+                "logins_per_day": logins_per_day,
                 "login_activity": login_activity
             })
         }
@@ -17,6 +17,7 @@ def lambda_handler(event, context):
     item = {
         "user_id": user_id,
         "login_timestamp": timestamp,
+        "login_date": timestamp[:10],  # Partition key of LoginsByDateIndex
         "success": success,
         "message": message,
     }
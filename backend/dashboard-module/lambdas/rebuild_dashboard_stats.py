@@ -0,0 +1,62 @@
+import boto3
+import os
+from boto3.dynamodb.conditions import Attr
+
+dynamodb = boto3.resource("dynamodb")
+stats_table_name = os.environ.get("STATS_TABLE_NAME", "DALScooterDashboardStats")
+users_table_name = os.environ.get("DYNAMODB_TABLE_NAME", "DALScooterUsers")
+logins_table_name = os.environ.get("LOGIN_TABLE_NAME", "UserLogins")
+bookings_table_name = os.environ.get("BOOKINGS_TABLE_NAME", "DALScooterBookings")
+stats_table = dynamodb.Table(stats_table_name)
+users_table = dynamodb.Table(users_table_name)
+logins_table = dynamodb.Table(logins_table_name)
+bookings_table = dynamodb.Table(bookings_table_name)
+
+STATS_KEY = {"statId": "dashboard"}
+
+def count_items(table, filter_expr):
+    """Count matching items with a paginated COUNT scan"""
+    response = table.scan(FilterExpression=filter_expr, Select="COUNT")
+    count = response["Count"]
+    while "LastEvaluatedKey" in response:
+        response = table.scan(
+            FilterExpression=filter_expr,
+            Select="COUNT",
+            ExclusiveStartKey=response["LastEvaluatedKey"]
+        )
+        count += response["Count"]
+    return count
+
+def count_logins_by_day():
+    """Count logins per YYYY-MM-DD day bucket"""
+    scan_params = {"ProjectionExpression": "login_timestamp"}
+    counts = {}
+    while True:
+        response = logins_table.scan(**scan_params)
+        for item in response.get("Items", []):
+            day = item.get("login_timestamp", "")[:10]
+            if day:
+                counts[day] = counts.get(day, 0) + 1
+        if "LastEvaluatedKey" not in response:
+            return counts
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def lambda_handler(event, context):
+    """
+    Rebuild the dashboard counters from scratch by scanning the source tables.
+    Run it once after enabling the stream aggregator, or whenever the counters
+    are suspected to have drifted. Stream updates that land while the rebuild
+    is running may be overwritten, so run it during a quiet period.
+    """
+    item = dict(STATS_KEY)
+    item["total_users"] = count_items(users_table, Attr("role").eq("user"))
+    item["total_active_bookings"] = count_items(bookings_table, Attr("status").eq("active"))
+    for day, count in count_logins_by_day().items():
+        item[f"logins#{day}"] = count
+
+    stats_table.put_item(Item=item)
+    print(f"Rebuilt dashboard stats: {item}")
+    return {"statusCode": 200, "total_users": item["total_users"], "total_active_bookings": item["total_active_bookings"]}
+
+if __name__ == "__main__":
+    lambda_handler({}, None)
@@ -0,0 +1,81 @@
+import boto3
+import os
+
+dynamodb = boto3.resource("dynamodb")
+stats_table_name = os.environ.get("STATS_TABLE_NAME", "DALScooterDashboardStats")
+users_table_name = os.environ.get("DYNAMODB_TABLE_NAME", "DALScooterUsers")
+logins_table_name = os.environ.get("LOGIN_TABLE_NAME", "UserLogins")
+bookings_table_name = os.environ.get("BOOKINGS_TABLE_NAME", "DALScooterBookings")
+stats_table = dynamodb.Table(stats_table_name)
+
+# All dashboard counters live on this single item
+STATS_KEY = {"statId": "dashboard"}
+
+def string_attr(image, name):
+    return (image or {}).get(name, {}).get("S")
+
+def user_delta(record):
+    """+1/-1 when a record with role = "user" appears or disappears"""
+    old_image = record["dynamodb"].get("OldImage")
+    new_image = record["dynamodb"].get("NewImage")
+    return int(string_attr(new_image, "role") == "user") - int(string_attr(old_image, "role") == "user")
+
+def active_booking_delta(record):
+    """+1/-1 when a booking enters or leaves the "active" status"""
+    old_image = record["dynamodb"].get("OldImage")
+    new_image = record["dynamodb"].get("NewImage")
+    return int(string_attr(new_image, "status") == "active") - int(string_attr(old_image, "status") == "active")
+
+def login_day(record):
+    """Day bucket (YYYY-MM-DD) of a newly logged login, or None"""
+    if record["eventName"] != "INSERT":
+        return None
+    timestamp = string_attr(record["dynamodb"].get("NewImage"), "login_timestamp")
+    return timestamp[:10] if timestamp else None
+
+def source_table(record):
+    # arn:aws:dynamodb:<region>:<account>:table/<name>/stream/<label>
+    return record["eventSourceARN"].split(":table/")[1].split("/")[0]
+
+def lambda_handler(event, context):
+    """
+    Apply DynamoDB stream records from the users, bookings and logins tables
+    to the dashboard counters. Deltas for the whole batch are combined into a
+    single atomic update, so a failed batch is retried without double counting.
+    """
+    deltas = {}
+    for record in event.get("Records", []):
+        table_name = source_table(record)
+        if table_name == users_table_name:
+            counter, delta = "total_users", user_delta(record)
+        elif table_name == bookings_table_name:
+            counter, delta = "total_active_bookings", active_booking_delta(record)
+        elif table_name == logins_table_name:
+            day = login_day(record)
+            counter, delta = (f"logins#{day}", 1) if day else (None, 0)
+        else:
+            print(f"Ignoring record from unexpected table: {table_name}")
+            continue
+
+        if counter and delta:
+            deltas[counter] = deltas.get(counter, 0) + delta
+
+    if not deltas:
+        return {"updated": 0}
+
+    names = {}
+    values = {}
+    clauses = []
+    for i, (counter, delta) in enumerate(deltas.items()):
+        names[f"#c{i}"] = counter
+        values[f":d{i}"] = delta
+        clauses.append(f"#c{i} :d{i}")
+
+    stats_table.update_item(
+        Key=STATS_KEY,
+        UpdateExpression="ADD " + ", ".join(clauses),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+    print(f"Applied dashboard deltas: {deltas}")
+    return {"updated": len(deltas)}
@@ -18,6 +18,41 @@ data "archive_file" "log_user_login_zip" {
   output_path = "${path.module}/../lambdas/log_user_login.zip"
 }
 
+data "archive_file" "update_dashboard_stats_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/update_dashboard_stats.py"
+  output_path = "${path.module}/../lambdas/update_dashboard_stats.zip"
+}
+
+data "archive_file" "rebuild_dashboard_stats_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/rebuild_dashboard_stats.py"
+  output_path = "${path.module}/../lambdas/rebuild_dashboard_stats.zip"
+}
+
+data "archive_file" "backfill_login_dates_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/backfill_login_dates.py"
+  output_path = "${path.module}/../lambdas/backfill_login_dates.zip"
+}
+
+# Dashboard counters, maintained from the users, bookings and logins table streams
+
+resource "aws_dynamodb_table" "dashboard_stats" {
+  name         = "DALScooterDashboardStats"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "statId"
+
+  attribute {
+    name = "statId"
+    type = "S"
+  }
+
+  tags = {
+    Name = "DALScooterDashboardStats"
+  }
+}
+
 # Lambda Functions
 
 resource "aws_lambda_function" "get_user_count" {
@@ -30,8 +65,12 @@ resource "aws_lambda_function" "get_user_count" {
   environment {
     variables = {
       COGNITO_USER_POOL_ID = var.cognito_user_pool_id
+      STATS_TABLE_NAME     = aws_dynamodb_table.dashboard_stats.name
     }
   }
+
+  # The recent-logins feed reads LoginsByDateIndex, which only holds logins with a login_date
+  depends_on = [aws_lambda_invocation.backfill_login_dates]
 }
 
 resource "aws_lambda_function" "log_user_login" {
@@ -48,6 +87,107 @@ resource "aws_lambda_function" "log_user_login" {
   }
 }
 
+resource "aws_lambda_function" "update_dashboard_stats" {
+  function_name    = "update_dashboard_stats"
+  role             = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  runtime          = "python3.12"
+  handler          = "update_dashboard_stats.lambda_handler"
+  filename         = data.archive_file.update_dashboard_stats_zip.output_path
+  source_code_hash = data.archive_file.update_dashboard_stats_zip.output_base64sha256
+
+  environment {
+    variables = {
+      STATS_TABLE_NAME = aws_dynamodb_table.dashboard_stats.name
+    }
+  }
+}
+
+# Rebuilds the counters from a full scan of the source tables; run on deploy
+# below, and by hand whenever the counters are suspected to have drifted
+resource "aws_lambda_function" "rebuild_dashboard_stats" {
+  function_name    = "rebuild_dashboard_stats"
+  role             = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  runtime          = "python3.12"
+  handler          = "rebuild_dashboard_stats.lambda_handler"
+  filename         = data.archive_file.rebuild_dashboard_stats_zip.output_path
+  source_code_hash = data.archive_file.rebuild_dashboard_stats_zip.output_base64sha256
+  timeout          = 900
+
+  environment {
+    variables = {
+      STATS_TABLE_NAME = aws_dynamodb_table.dashboard_stats.name
+    }
+  }
+}
+
+# One-off: sets login_date on logins written before LoginsByDateIndex existed
+resource "aws_lambda_function" "backfill_login_dates" {
+  function_name    = "backfill_login_dates"
+  role             = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  runtime          = "python3.12"
+  handler          = "backfill_login_dates.lambda_handler"
+  filename         = data.archive_file.backfill_login_dates_zip.output_path
+  source_code_hash = data.archive_file.backfill_login_dates_zip.output_base64sha256
+  timeout          = 900
+
+  environment {
+    variables = {
+      LOGIN_TABLE_NAME = "UserLogins"
+    }
+  }
+}
+
+resource "aws_lambda_invocation" "backfill_login_dates" {
+  function_name = aws_lambda_function.backfill_login_dates.function_name
+  input         = jsonencode({})
+
+  # Runs once the UserLogins table (auth module) exists, and again if it is replaced
+  triggers = {
+    user_logins_stream = var.user_logins_table_stream_arn
+  }
+}
+
+# Stream triggers
+
+resource "aws_lambda_event_source_mapping" "users_stream" {
+  event_source_arn  = var.users_table_stream_arn
+  function_name     = aws_lambda_function.update_dashboard_stats.function_name
+  starting_position = "LATEST"
+  batch_size        = 100
+}
+
+resource "aws_lambda_event_source_mapping" "bookings_stream" {
+  event_source_arn  = var.bookings_table_stream_arn
+  function_name     = aws_lambda_function.update_dashboard_stats.function_name
+  starting_position = "LATEST"
+  batch_size        = 100
+}
+
+resource "aws_lambda_event_source_mapping" "user_logins_stream" {
+  event_source_arn  = var.user_logins_table_stream_arn
+  function_name     = aws_lambda_function.update_dashboard_stats.function_name
+  starting_position = "LATEST"
+  batch_size        = 100
+}
+
+# The stream mappings start at LATEST, so everything written before they
+# existed is only counted by a full rebuild. Runs once they are live, and again
+# if the stats table is replaced.
+resource "aws_lambda_invocation" "rebuild_dashboard_stats" {
+  function_name = aws_lambda_function.rebuild_dashboard_stats.function_name
+  input         = jsonencode({})
+
+  triggers = {
+    stats_table = aws_dynamodb_table.dashboard_stats.arn
+  }
+
+  depends_on = [
+    aws_lambda_event_source_mapping.users_stream,
+    aws_lambda_event_source_mapping.bookings_stream,
+    aws_lambda_event_source_mapping.user_logins_stream
+  ]
+}
+
 # API Gateway
 
 resource "aws_apigatewayv2_api" "user_api" {
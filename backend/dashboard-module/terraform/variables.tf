@@ -6,3 +6,18 @@ variable "cognito_user_pool_id" {
   description = "The Cognito user pool ID"
   default     = ""
 }
+
+variable "users_table_stream_arn" {
+  description = "Stream ARN of the DALScooterUsers table"
+  type        = string
+}
+
+variable "user_logins_table_stream_arn" {
+  description = "Stream ARN of the UserLogins table"
+  type        = string
+}
+
+variable "bookings_table_stream_arn" {
+  description = "Stream ARN of the DALScooterBookings table"
+  type        = string
+}
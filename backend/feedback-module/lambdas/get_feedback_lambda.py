@@ -1,7 +1,8 @@
 import json
 import boto3
 import os
-from boto3.dynamodb.conditions import Attr
+import base64
+from boto3.dynamodb.conditions import Key
 import logging
 
 logger = logging.getLogger()
@@ -11,26 +12,90 @@ dynamodb = boto3.resource('dynamodb')
 table_name = os.environ['FEEDBACK_TABLE']
 table = dynamodb.Table(table_name)
 
+# Attributes the feedback views render (also the GSI projections)
+FEEDBACK_FIELDS = ['feedbackId', 'bikeId', 'model', 'type', 'userEmail', 'comment', 'rating', 'sentiment', 'timestamp']
+# Page size bounds for ?limit=
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+
 def lambda_handler(event, context):
     try:
         logger.info(f"Incoming event: {json.dumps(event)}")
         query_params = event.get('queryStringParameters') or {}
-        model_filter = query_params.get('model') if 'model' in query_params else None
+        model_filter = query_params.get('model')
+        bike_filter = query_params.get('bikeId')
+        limit = query_params.get('limit')
+        cursor = query_params.get('cursor')
+
+        read_params = {
+            'ProjectionExpression': ', '.join(f'#{field}' for field in FEEDBACK_FIELDS),
+            'ExpressionAttributeNames': {f'#{field}': field for field in FEEDBACK_FIELDS}
+        }
 
-        if model_filter:
+        if bike_filter:
+            logger.info(f"Fetching feedbacks for bike: {bike_filter}")
+            read = table.query
+            read_params['IndexName'] = 'BikeFeedbackIndex'
+            read_params['KeyConditionExpression'] = Key('bikeId').eq(bike_filter)
+            read_params['ScanIndexForward'] = False  # Newest first
+        elif model_filter:
             logger.info(f"Fetching feedbacks for model: {model_filter}")
-            response = table.scan(
-                FilterExpression=Attr('model').eq(model_filter)
-            )
+            read = table.query
+            read_params['IndexName'] = 'ModelFeedbackIndex'
+            read_params['KeyConditionExpression'] = Key('model').eq(model_filter)
+            read_params['ScanIndexForward'] = False  # Newest first
         else:
             logger.info("Fetching all feedbacks")
-            response = table.scan()
+            read = table.scan
 
-        items = sorted(response['Items'], key=lambda x: x.get('timestamp', ''), reverse=True)
+        if limit is None and cursor is None:
+            response = read(**read_params)
+            items = response['Items']
+            while 'LastEvaluatedKey' in response:
+                response = read(ExclusiveStartKey=response['LastEvaluatedKey'], **read_params)
+                items.extend(response['Items'])
+
+            if 'IndexName' not in read_params:
+                items.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+
+            return {
+                'statusCode': 200,
+                'body': json.dumps(items)
+            }
+
+        try:
+            page_size = int(limit) if limit is not None else MAX_PAGE_SIZE
+            if cursor:
+                read_params['ExclusiveStartKey'] = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Invalid limit or cursor'})
+            }
+        if page_size < 1 or page_size > MAX_PAGE_SIZE:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'})
+            }
+        read_params['Limit'] = page_size
+
+        # Index pages are newest-first; unfiltered pages follow table order
+        response = read(**read_params)
+        items = response['Items']
+        next_cursor = encode_cursor(response['LastEvaluatedKey']) if 'LastEvaluatedKey' in response else None
 
         return {
             'statusCode': 200,
-            'body': json.dumps(items)
+            'body': json.dumps({
+                'feedback': items,
+                'count': len(items),
+                'nextCursor': next_cursor
+            })
         }
 
     except Exception as e:
@@ -38,4 +103,4 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,62 @@
+import json
+import boto3
+import os
+import logging
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = boto3.resource('dynamodb')
+summary_table_name = os.environ['FEEDBACK_SUMMARY_TABLE']
+summary_table = dynamodb.Table(summary_table_name)
+
+def lambda_handler(event, context):
+    """
+    Return the rating and sentiment summary for a model or a bike
+    Query parameters: model or bikeId
+    """
+    try:
+        logger.info(f"Incoming event: {json.dumps(event)}")
+        query_params = event.get('queryStringParameters') or {}
+
+        if query_params.get('bikeId'):
+            summary_id = f"bike#{query_params['bikeId']}"
+        elif query_params.get('model'):
+            summary_id = f"model#{query_params['model']}"
+        else:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Missing model or bikeId parameter'})
+            }
+
+        item = summary_table.get_item(Key={'summaryId': summary_id}).get('Item', {})
+
+        rating_count = int(item.get('ratingCount', 0))
+        rating_sum = int(item.get('ratingSum', 0))
+        summary = {
+            'feedbackCount': int(item.get('feedbackCount', 0)),
+            'ratingCount': rating_count,
+            'averageRating': round(rating_sum / rating_count, 2) if rating_count else None,
+            'ratingHistogram': {str(star): int(item.get(f'rating{star}Count', 0)) for star in range(1, 6)},
+            'sentiment': {
+                'Positive': int(item.get('positiveCount', 0)),
+                'Neutral': int(item.get('neutralCount', 0)),
+                'Negative': int(item.get('negativeCount', 0))
+            }
+        }
+        if query_params.get('bikeId'):
+            summary['bikeId'] = query_params['bikeId']
+        else:
+            summary['model'] = query_params['model']
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps(summary)
+        }
+
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,64 @@
+import boto3
+import os
+import logging
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = boto3.resource('dynamodb')
+feedback_table = dynamodb.Table(os.environ.get('FEEDBACK_TABLE', 'FeedbackTable'))
+summary_table = dynamodb.Table(os.environ.get('FEEDBACK_SUMMARY_TABLE', 'FeedbackSummaryTable'))
+
+def add_feedback(summary, item):
+    """
+    Count one feedback item the way submit_feedback_lambda.summary_update does
+    """
+    summary['feedbackCount'] = summary.get('feedbackCount', 0) + 1
+    sentiment_counter = f"{item.get('sentiment', 'Neutral').lower()}Count"
+    summary[sentiment_counter] = summary.get(sentiment_counter, 0) + 1
+
+    rating = item.get('rating')
+    if rating is not None:
+        try:
+            rating = min(max(round(float(rating)), 1), 5)
+        except (ValueError, OverflowError):
+            return
+        summary['ratingCount'] = summary.get('ratingCount', 0) + 1
+        summary['ratingSum'] = summary.get('ratingSum', 0) + rating
+        summary[f'rating{rating}Count'] = summary.get(f'rating{rating}Count', 0) + 1
+
+def lambda_handler(event, context):
+    """
+    Rebuild every per-model and per-bike summary from a full scan of the
+    feedback table. Deployment runs it once the summary-maintaining submit
+    Lambda is live; invoke it again whenever the summaries are suspected to
+    have drifted. Feedback submitted while it runs may be overwritten, so run
+    it during a quiet period.
+    """
+    scan_params = {
+        'ProjectionExpression': 'bikeId, #model, rating, sentiment',
+        'ExpressionAttributeNames': {'#model': 'model'}
+    }
+    summaries = {}
+    scanned = 0
+    while True:
+        response = feedback_table.scan(**scan_params)
+        for item in response.get('Items', []):
+            scanned += 1
+            if item.get('model'):
+                add_feedback(summaries.setdefault(f"model#{item['model']}", {}), item)
+            if item.get('bikeId'):
+                add_feedback(summaries.setdefault(f"bike#{item['bikeId']}", {}), item)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with summary_table.batch_writer() as batch:
+        for summary_id, counters in summaries.items():
+            batch.put_item(Item=dict(counters, summaryId=summary_id))
+
+    logger.info(f"Rebuilt {len(summaries)} summaries from {scanned} feedback item(s)")
+    return {'statusCode': 200, 'summaries': len(summaries), 'feedback': scanned}
+
+if __name__ == '__main__':
+    lambda_handler({}, None)
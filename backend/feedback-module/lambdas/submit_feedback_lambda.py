@@ -11,6 +11,7 @@ logger.setLevel(logging.INFO)
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ['FEEDBACK_TABLE']
 table = dynamodb.Table(table_name)
+summary_table_name = os.environ['FEEDBACK_SUMMARY_TABLE']
 
 def analyze_sentiment(text):
     positive_keywords = ['good', 'great', 'excellent', 'awesome', 'love', 'nice', 'happy']
@@ -32,6 +33,41 @@ def analyze_sentiment(text):
     else:
         return 'Neutral'
 
+def parse_rating(value):
+    """
+    Round a submitted rating to a whole star and clamp it to 1-5.
+    Raises ValueError if it isn't a finite number.
+    """
+    if isinstance(value, bool):
+        raise ValueError('rating must be a number')
+    try:
+        return min(max(round(float(value)), 1), 5)
+    except (TypeError, OverflowError):
+        raise ValueError('rating must be a number')
+
+def summary_update(summary_id, rating, sentiment):
+    """
+    Build the atomic counter update for one per-model or per-bike summary record
+    """
+    counters = {
+        'feedbackCount': 1,
+        f'{sentiment.lower()}Count': 1
+    }
+    if rating is not None:
+        counters['ratingCount'] = 1
+        counters['ratingSum'] = rating
+        counters[f'rating{rating}Count'] = 1  # Histogram bucket
+
+    return {
+        'Update': {
+            'TableName': summary_table_name,
+            'Key': {'summaryId': summary_id},
+            'UpdateExpression': 'ADD ' + ', '.join(f'#{name} :{name}' for name in counters),
+            'ExpressionAttributeNames': {f'#{name}': name for name in counters},
+            'ExpressionAttributeValues': {f':{name}': value for name, value in counters.items()}
+        }
+    }
+
 def lambda_handler(event, context):
     try:
         logger.info(f"Incoming event: {json.dumps(event)}")
@@ -45,6 +81,15 @@ def lambda_handler(event, context):
         vehicle_type = body['type']
         rating = body.get('rating', None)
 
+        if rating is not None:
+            try:
+                rating = parse_rating(rating)
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'rating must be a number between 1 and 5'})
+                }
+
         sentiment = analyze_sentiment(comment)
 
         item = {
@@ -58,11 +103,17 @@ def lambda_handler(event, context):
             'timestamp': datetime.utcnow().isoformat()
         }
 
+        # Stored exactly as it is counted in the summaries
         if rating is not None:
             item['rating'] = str(rating)
 
+        # Store the feedback and bump the model and bike summaries in one transaction
         logger.info(f"Storing feedback: {item}")
-        table.put_item(Item=item)
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': table_name, 'Item': item}},
+            summary_update(f'model#{model}', rating, sentiment),
+            summary_update(f'bike#{bike_id}', rating, sentiment)
+        ])
 
         return {
             'statusCode': 200,
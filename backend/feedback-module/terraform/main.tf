@@ -18,6 +18,20 @@ data "archive_file" "get_feedback_zip" {
   output_path = "${path.module}/../lambdas/get_feedback_lambda.zip"
 }
 
+# Archive feedback summary lambda
+data "archive_file" "get_feedback_summary_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/get_feedback_summary_lambda.py"
+  output_path = "${path.module}/../lambdas/get_feedback_summary_lambda.zip"
+}
+
+# Archive summary rebuild lambda
+data "archive_file" "rebuild_feedback_summaries_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/rebuild_feedback_summaries.py"
+  output_path = "${path.module}/../lambdas/rebuild_feedback_summaries.zip"
+}
+
 resource "aws_dynamodb_table" "feedback_table" {
   name         = var.feedback_table_name
   billing_mode = "PAY_PER_REQUEST"
@@ -28,6 +42,56 @@ resource "aws_dynamodb_table" "feedback_table" {
     type = "S"
   }
 
+  attribute {
+    name = "model"
+    type = "S"
+  }
+
+  attribute {
+    name = "bikeId"
+    type = "S"
+  }
+
+  attribute {
+    name = "timestamp"
+    type = "S"
+  }
+
+  # Feedback per model, newest first (only the attributes the UI renders)
+  global_secondary_index {
+    name               = "ModelFeedbackIndex"
+    hash_key           = "model"
+    range_key          = "timestamp"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["bikeId", "type", "userEmail", "comment", "rating", "sentiment"]
+  }
+
+  # Feedback per bike, newest first (only the attributes the UI renders)
+  global_secondary_index {
+    name               = "BikeFeedbackIndex"
+    hash_key           = "bikeId"
+    range_key          = "timestamp"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["model", "type", "userEmail", "comment", "rating", "sentiment"]
+  }
+
+  tags = {
+    Module = "Feedback"
+    Project = "DALScooter"
+  }
+}
+
+# Rating and sentiment counters per model ("model#<model>") and per bike ("bike#<bikeId>")
+resource "aws_dynamodb_table" "feedback_summary_table" {
+  name         = var.feedback_summary_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "summaryId"
+
+  attribute {
+    name = "summaryId"
+    type = "S"
+  }
+
   tags = {
     Module = "Feedback"
     Project = "DALScooter"
@@ -39,11 +103,13 @@ resource "aws_lambda_function" "submit_feedback_lambda" {
   handler       = "submit_feedback_lambda.lambda_handler"
   runtime       = "python3.11"
   filename      = data.archive_file.submit_feedback_zip.output_path
+  source_code_hash = data.archive_file.submit_feedback_zip.output_base64sha256
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
     variables = {
-      FEEDBACK_TABLE = aws_dynamodb_table.feedback_table.name
+      FEEDBACK_TABLE         = aws_dynamodb_table.feedback_table.name
+      FEEDBACK_SUMMARY_TABLE = aws_dynamodb_table.feedback_summary_table.name
     }
   }
 }
@@ -53,6 +119,7 @@ resource "aws_lambda_function" "get_feedback_lambda" {
   handler       = "get_feedback_lambda.lambda_handler"
   runtime       = "python3.11"
   filename      = data.archive_file.get_feedback_zip.output_path
+  source_code_hash = data.archive_file.get_feedback_zip.output_base64sha256
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
@@ -62,6 +129,52 @@ resource "aws_lambda_function" "get_feedback_lambda" {
   }
 }
 
+resource "aws_lambda_function" "get_feedback_summary_lambda" {
+  function_name = var.get_feedback_summary_lambda_name
+  handler       = "get_feedback_summary_lambda.lambda_handler"
+  runtime       = "python3.11"
+  filename      = data.archive_file.get_feedback_summary_zip.output_path
+  source_code_hash = data.archive_file.get_feedback_summary_zip.output_base64sha256
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+
+  environment {
+    variables = {
+      FEEDBACK_SUMMARY_TABLE = aws_dynamodb_table.feedback_summary_table.name
+    }
+  }
+}
+
+# Rebuilds the summaries from a full scan of the feedback table; invoke manually on drift
+resource "aws_lambda_function" "rebuild_feedback_summaries_lambda" {
+  function_name = "rebuild_feedback_summaries"
+  handler       = "rebuild_feedback_summaries.lambda_handler"
+  runtime       = "python3.11"
+  filename      = data.archive_file.rebuild_feedback_summaries_zip.output_path
+  source_code_hash = data.archive_file.rebuild_feedback_summaries_zip.output_base64sha256
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 900
+
+  environment {
+    variables = {
+      FEEDBACK_TABLE         = aws_dynamodb_table.feedback_table.name
+      FEEDBACK_SUMMARY_TABLE = aws_dynamodb_table.feedback_summary_table.name
+    }
+  }
+}
+
+# Counts the feedback that predates the summaries: runs once the submit Lambda
+# maintains them, so no feedback is missed between the scan and the switch
+resource "aws_lambda_invocation" "rebuild_feedback_summaries" {
+  function_name = aws_lambda_function.rebuild_feedback_summaries_lambda.function_name
+  input         = jsonencode({})
+
+  triggers = {
+    summary_table = aws_dynamodb_table.feedback_summary_table.arn
+  }
+
+  depends_on = [aws_lambda_function.submit_feedback_lambda]
+}
+
 resource "aws_apigatewayv2_api" "feedback_api" {
   name          = "feedback-api"
   protocol_type = "HTTP"
@@ -132,6 +245,28 @@ resource "aws_lambda_permission" "get_feedback_permission" {
   source_arn    = "${aws_apigatewayv2_api.feedback_api.execution_arn}/*/*"
 }
 
+resource "aws_apigatewayv2_integration" "get_feedback_summary_integration" {
+  api_id                 = aws_apigatewayv2_api.feedback_api.id
+  integration_type       = "AWS_PROXY"
+  integration_uri        = aws_lambda_function.get_feedback_summary_lambda.invoke_arn
+  integration_method     = "POST"
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "get_feedback_summary_route" {
+  api_id    = aws_apigatewayv2_api.feedback_api.id
+  route_key = "GET /feedback-summary"
+  target    = "integrations/${aws_apigatewayv2_integration.get_feedback_summary_integration.id}"
+}
+
+resource "aws_lambda_permission" "get_feedback_summary_permission" {
+  statement_id  = "AllowAPIGatewayInvokeSummary"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.get_feedback_summary_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.feedback_api.execution_arn}/*/*"
+}
+
 resource "aws_apigatewayv2_stage" "default" {
   api_id      = aws_apigatewayv2_api.feedback_api.id
   name        = "$default"
@@ -7,6 +7,10 @@ variable "feedback_table_name" {
   default = "FeedbackTable"
 }
 
+variable "feedback_summary_table_name" {
+  default = "FeedbackSummaryTable"
+}
+
 variable "submit_feedback_lambda_name" {
   default = "DALScooterSubmitFeedbackLambda"
 }
@@ -15,6 +19,10 @@ variable "get_feedback_lambda_name" {
   default = "DALScooterGetFeedbackLambda"
 }
 
+variable "get_feedback_summary_lambda_name" {
+  default = "DALScooterGetFeedbackSummaryLambda"
+}
+
 variable "cognito_user_pool_id" {
   description = "Cognito User Pool ID"
   type        = string
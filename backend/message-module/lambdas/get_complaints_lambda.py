@@ -1,8 +1,10 @@
 import json
 import os
+import base64
 import boto3
 import logging
-from boto3.dynamodb.conditions import Key, Attr
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -10,6 +12,21 @@ logger.setLevel(logging.INFO)
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
 
+# Page size bounds for ?limit=
+MAX_PAGE_SIZE = 100
+
+def json_default(value):
+    # Summary counters (replyCount) come back from DynamoDB as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+
 def lambda_handler(event, context):
     logger.info("Incoming event: %s", json.dumps(event))
 
@@ -18,25 +35,61 @@ def lambda_handler(event, context):
         user_id = claims["sub"]
         query_params = event.get("queryStringParameters", {}) or {}
         role = query_params.get("role", "user").lower()
+        limit = query_params.get("limit")
+        cursor = query_params.get("cursor")
 
         logger.info("Caller role: %s | Cognito sub: %s", role, user_id)
 
-        # Filter by assignedFranchiseId if role is franchise
+        # Franchise inbox is keyed by assignedFranchiseId, user inbox by userId;
+        # both indexes are sorted by timestampUTC
         if role == "franchise":
-            filter_expr = Attr("assignedFranchiseId").eq(user_id)
+            index_query = {
+                "IndexName": "FranchiseComplaintsIndex",
+                "KeyConditionExpression": Key("assignedFranchiseId").eq(user_id)
+            }
         else:
-            filter_expr = Attr("userId").eq(user_id)
+            index_query = {
+                "IndexName": "UserComplaintsIndex",
+                "KeyConditionExpression": Key("userId").eq(user_id)
+            }
+        index_query["ScanIndexForward"] = False  # Newest first
 
-        # Scan with filter (assuming PAY_PER_REQUEST, no GSI needed)
-        response = table.scan(
-            FilterExpression=filter_expr
-        )
+        if limit is None and cursor is None:
+            # Whole inbox: follow LastEvaluatedKey so nothing past 1 MB is dropped
+            response = table.query(**index_query)
+            items = response.get("Items", [])
+            while "LastEvaluatedKey" in response:
+                response = table.query(ExclusiveStartKey=response["LastEvaluatedKey"], **index_query)
+                items.extend(response.get("Items", []))
+            logger.info("Fetched %d complaint(s)", len(items))
+
+            return {
+                "statusCode": 200,
+                "body": json.dumps(items, default=json_default)
+            }
+
+        try:
+            page_size = int(limit) if limit is not None else MAX_PAGE_SIZE
+            if cursor:
+                index_query["ExclusiveStartKey"] = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return {"statusCode": 400, "body": json.dumps({"error": "Invalid limit or cursor."})}
+        if page_size < 1 or page_size > MAX_PAGE_SIZE:
+            return {"statusCode": 400, "body": json.dumps({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}."})}
+        index_query["Limit"] = page_size
+
+        response = table.query(**index_query)
         items = response.get("Items", [])
-        logger.info("Fetched %d complaint(s)", len(items))
+        next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+        logger.info("Fetched page of %d complaint(s)", len(items))
 
         return {
             "statusCode": 200,
-            "body": json.dumps(items)
+            "body": json.dumps({
+                "complaints": items,
+                "count": len(items),
+                "nextCursor": next_cursor
+            }, default=json_default)
         }
 
     except Exception as e:
@@ -44,4 +97,4 @@ def lambda_handler(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"error": "Internal Server Error"})
-        }
\ No newline at end of file
+        }
@@ -1,15 +1,100 @@
 import json
 import os
+import time
+import base64
 import boto3
 import logging
+from collections import OrderedDict
+from decimal import Decimal
+from functools import lru_cache
+from boto3.dynamodb.conditions import Key
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+# Profiles written at registration (userId = Cognito sub), including email
+users_table = dynamodb.Table(os.environ.get("USERS_TABLE", "DALScooterUsers"))
+replies_table = dynamodb.Table(os.environ["REPLIES_TABLE"])
 
-cognito = boto3.client("cognito-idp")
+# Replies per page (?limit=), oldest first
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+REPLY_FIELDS = ["responderId", "message", "timestamp"]
+
+# Resolved emails cached per container: {userId: (expires at, email)}
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL_SECONDS = int(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "900"))
+profile_cache = OrderedDict()
+
+# Only needed for users missing from DALScooterUsers, so built on first use
+@lru_cache(maxsize=None)
+def cognito_client():
+    return boto3.client("cognito-idp")
+
+def lookup_email(user_id):
+    """
+    Email for a user: DALScooterUsers first, Cognito only as a fallback
+    """
+    response = users_table.get_item(Key={"userId": user_id}, ProjectionExpression="email")
+    email = response.get("Item", {}).get("email")
+    if email:
+        return email
+
+    logger.info("No stored profile for %s, falling back to Cognito", user_id)
+    user_info = cognito_client().admin_get_user(
+        UserPoolId=os.environ["USER_POOL_ID"],
+        Username=user_id
+    )
+    return next(
+        (attr["Value"] for attr in user_info["UserAttributes"] if attr["Name"] == "email"),
+        None
+    )
+
+def resolve_email(user_id):
+    """
+    Cached email lookup with a TTL, evicting the least recently used profile
+    """
+    entry = profile_cache.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        profile_cache.move_to_end(user_id)
+        return entry[1]
+
+    email = lookup_email(user_id)
+    profile_cache[user_id] = (time.monotonic() + PROFILE_CACHE_TTL_SECONDS, email)
+    profile_cache.move_to_end(user_id)
+    while len(profile_cache) > PROFILE_CACHE_SIZE:
+        profile_cache.popitem(last=False)
+    return email
+
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+def json_default(value):
+    # Summary counters come back from DynamoDB as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+def reply_page(complaint_id, page_size, start_key):
+    """
+    One page of the complaint's replies in posting order, plus the next cursor
+    """
+    query = {
+        "KeyConditionExpression": Key("complaintId").eq(complaint_id),
+        "ProjectionExpression": ", ".join(f"#{field}" for field in REPLY_FIELDS),
+        "ExpressionAttributeNames": {f"#{field}": field for field in REPLY_FIELDS},
+        "Limit": page_size
+    }
+    if start_key:
+        query["ExclusiveStartKey"] = start_key
+    response = replies_table.query(**query)
+    next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+    return response.get("Items", []), next_cursor
 
 def lambda_handler(event, context):
     logger.info("Event: %s", json.dumps(event))
@@ -21,6 +106,15 @@ def lambda_handler(event, context):
         is_franchise = "BikeFranchise" in groups
 
         complaint_id = event["pathParameters"]["id"]
+        query_params = event.get("queryStringParameters") or {}
+        try:
+            page_size = int(query_params.get("limit", DEFAULT_PAGE_SIZE))
+            cursor = query_params.get("cursor")
+            start_key = decode_cursor(cursor) if cursor else None
+        except (ValueError, UnicodeDecodeError):
+            return {"statusCode": 400, "body": json.dumps({"error": "Invalid limit or cursor."})}
+        if page_size < 1 or page_size > MAX_PAGE_SIZE:
+            return {"statusCode": 400, "body": json.dumps({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}."})}
 
         # Fetch the complaint by ID
         response = table.get_item(Key={"messageId": complaint_id})
@@ -36,21 +130,20 @@ def lambda_handler(event, context):
         # If the requester is the assigned franchise, fetch user email
         if is_franchise and user_id == item["assignedFranchiseId"]:
             try:
-                user_info = cognito.admin_get_user(
-                    UserPoolId=os.environ["USER_POOL_ID"],
-                    Username=item["userId"]
-                )
-                user_email = next(
-                    (attr["Value"] for attr in user_info["UserAttributes"] if attr["Name"] == "email"),
-                    None
-                )
-                item["userEmail"] = user_email
+                item["userEmail"] = resolve_email(item["userId"])
             except Exception as e:
                 logger.warning("Unable to fetch user email: %s", str(e))
         
+        # Replies live in their own table; complaints answered before that keep
+        # their original list, which stays ahead of the first page
+        replies, next_cursor = reply_page(complaint_id, page_size, start_key)
+        legacy_replies = item.get("responses", []) if not cursor else []
+        item["responses"] = legacy_replies + replies
+        item["responsesCursor"] = next_cursor
+
         return {
             "statusCode": 200,
-            "body": json.dumps(item)
+            "body": json.dumps(item, default=json_default)
         }
 
     except Exception as e:
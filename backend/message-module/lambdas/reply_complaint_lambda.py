@@ -1,15 +1,42 @@
 import json
 import boto3
 import os
+import uuid
 import logging
 from datetime import datetime
-from boto3.dynamodb.conditions import Key
+from functools import lru_cache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Reads of the complaint status before a reply gives up on concurrent changes
+REPLY_ATTEMPTS = 3
+
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+# One item per reply, keyed by complaint and "<timestamp>#<id>" in posting order
+replies_table = dynamodb.Table(os.environ["REPLIES_TABLE"])
+
+# Only the first answer to a complaint touches the load table, so it is built
+# on first use and reused by later invocations in the container
+@lru_cache(maxsize=None)
+def load_table():
+    return dynamodb.Table(os.environ["FRANCHISE_LOAD_TABLE"])
+
+def release_open_complaint(franchise_id):
+    """
+    Take one complaint off the franchise's open-complaint counter, never below
+    zero (counters that predate load-aware routing may be missing or low)
+    """
+    try:
+        load_table().update_item(
+            Key={"franchiseId": franchise_id},
+            UpdateExpression="ADD openComplaints :minusOne",
+            ConditionExpression="openComplaints > :zero",
+            ExpressionAttributeValues={":minusOne": -1, ":zero": 0}
+        )
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.warning("Open-complaint counter of %s is already zero", franchise_id)
 
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
@@ -31,38 +58,62 @@ def lambda_handler(event, context):
         if not reply_message:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing reply message."})}
 
-        # Get complaint from DynamoDB
-        response = table.get_item(Key={"messageId": complaint_id})
-        complaint = response.get("Item")
-
-        if not complaint:
-            return {"statusCode": 404, "body": json.dumps({"error": "Complaint not found."})}
-
-        if complaint.get("assignedFranchiseId") != user_id:
-            return {"statusCode": 403, "body": json.dumps({"error": "You are not assigned to this complaint."})}
-
-        # Append new response
-        new_response = {
+        # Store the reply as its own item; the complaint only keeps a summary,
+        # so neither its size nor concurrent replies depend on thread length
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        reply = {
+            "complaintId": complaint_id,
+            "replyKey": f"{timestamp}#{uuid.uuid4()}",
             "responderId": user_id,
             "message": reply_message,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": timestamp
         }
 
-        updated_responses = complaint.get("responses", [])
-        updated_responses.append(new_response)
-
-        table.update_item(
-            Key={"messageId": complaint_id},
-            UpdateExpression="SET #r = :r, #s = :s",
-            ExpressionAttributeNames={
-                "#r": "responses",
-                "#s": "status"
-            },
-            ExpressionAttributeValues={
-                ":r": updated_responses,
-                ":s": "answered"
-            }
-        )
+        # The reply and the complaint summary commit together. The status read
+        # below is pinned by the update's condition, so exactly one reply sees
+        # the complaint unanswered; a concurrent first answer cancels the
+        # transaction and it is retried against the new status.
+        for attempt in range(REPLY_ATTEMPTS):
+            response = table.get_item(Key={"messageId": complaint_id}, ProjectionExpression="assignedFranchiseId, #s",
+                                      ExpressionAttributeNames={"#s": "status"})
+            complaint = response.get("Item")
+
+            if not complaint:
+                return {"statusCode": 404, "body": json.dumps({"error": "Complaint not found."})}
+
+            if complaint.get("assignedFranchiseId") != user_id:
+                return {"statusCode": 403, "body": json.dumps({"error": "You are not assigned to this complaint."})}
+
+            first_answer = complaint.get("status") != "answered"
+            try:
+                dynamodb.meta.client.transact_write_items(TransactItems=[
+                    {"Put": {"TableName": replies_table.name, "Item": reply}},
+                    {"Update": {
+                        "TableName": table.name,
+                        "Key": {"messageId": complaint_id},
+                        "UpdateExpression": "SET #s = :s, lastReplyAt = :t, lastResponderId = :r ADD replyCount :one",
+                        "ConditionExpression": "assignedFranchiseId = :r AND " + (
+                            "(attribute_not_exists(#s) OR #s <> :s)" if first_answer else "#s = :s"
+                        ),
+                        "ExpressionAttributeNames": {"#s": "status"},
+                        "ExpressionAttributeValues": {
+                            ":s": "answered",
+                            ":t": timestamp,
+                            ":r": user_id,
+                            ":one": 1
+                        }
+                    }}
+                ])
+                break
+            except dynamodb.meta.client.exceptions.TransactionCanceledException as e:
+                logger.warning("Reply to %s cancelled (attempt %d): %s", complaint_id, attempt + 1, str(e))
+        else:
+            return {"statusCode": 409, "body": json.dumps({"error": "Complaint was changed by another request, please try again."})}
+
+        # The first answer closes the complaint: release it from the franchise's
+        # open-complaint counter used for load-aware routing
+        if first_answer:
+            release_open_complaint(user_id)
 
         return {
             "statusCode": 200,
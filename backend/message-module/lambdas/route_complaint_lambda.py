@@ -2,54 +2,227 @@ import json
 import boto3
 import os
 import random
-import uuid
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def lambda_handler(event, context):
-    logger.info("Received SNS event: %s", json.dumps(event))
+FRANCHISE_GROUP = "BikeFranchise"
+# How long a container trusts its franchise roster and load snapshot
+ROSTER_TTL_SECONDS = int(os.environ.get("ROSTER_TTL_SECONDS", "300"))
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+# Batch rounds for unprocessed keys before giving up on them
+MAX_READ_ATTEMPTS = 5
+# Parallel conditional puts of the batch's complaint logs (SQS batch size is 25)
+LOG_WRITE_WORKERS = 25
+# Backoff between rounds: full jitter, doubling from BASE up to MAX seconds
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 2.0
 
-    try:
-        message = json.loads(event["Records"][0]["Sns"]["Message"])
-        logger.info("Parsed message: %s", message)
+# Clients are built on first use and reused by later invocations in the container
+@lru_cache(maxsize=None)
+def cognito_client():
+    return boto3.client("cognito-idp")
+
+@lru_cache(maxsize=None)
+def complaints_table():
+    return boto3.resource("dynamodb").Table(os.environ["DYNAMODB_TABLE_NAME"])
+
+@lru_cache(maxsize=None)
+def load_table():
+    return boto3.resource("dynamodb").Table(os.environ["FRANCHISE_LOAD_TABLE"])
 
-        cognito = boto3.client("cognito-idp")
-        dynamodb = boto3.resource("dynamodb")
-        table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+# {"expiresAt": monotonic deadline, "members": {sub: email}, "load": {sub: open complaints}}
+roster = {"expiresAt": 0, "members": {}, "load": {}}
 
-        response = cognito.list_users_in_group(
-            UserPoolId=os.environ["USER_POOL_ID"],
-            GroupName="BikeFranchise"
-        )
-        franchise_users = response["Users"]
-        logger.info("Fetched franchise users: %s", franchise_users)
+def fetch_franchise_members():
+    """
+    Every member of the franchise group, following NextToken past the 60-user page
+    """
+    members = {}
+    paginator = cognito_client().get_paginator("list_users_in_group")
+    for page in paginator.paginate(UserPoolId=os.environ["USER_POOL_ID"], GroupName=FRANCHISE_GROUP):
+        for user in page["Users"]:
+            attributes = {attr["Name"]: attr["Value"] for attr in user["Attributes"]}
+            if "sub" in attributes:
+                members[attributes["sub"]] = attributes.get("email")
+    return members
 
-        selected = random.choice(franchise_users)
-        logger.info("Selected franchise user: %s", selected)
+def fetch_open_complaints(franchise_ids):
+    """
+    Open-complaint counters for the given franchise users (missing counters are 0).
+    Unprocessed keys are retried with backoff; raises RuntimeError if some are
+    still unprocessed after MAX_READ_ATTEMPTS rounds.
+    """
+    load = dict.fromkeys(franchise_ids, 0)
+    client = load_table().meta.client
+    table_name = load_table().name
+    keys = [{"franchiseId": franchise_id} for franchise_id in franchise_ids]
+    for i in range(0, len(keys), BATCH_GET_SIZE):
+        request = {table_name: {"Keys": keys[i:i + BATCH_GET_SIZE], "ProjectionExpression": "franchiseId, openComplaints"}}
+        for attempt in range(MAX_READ_ATTEMPTS):
+            response = client.batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(table_name, []):
+                load[item["franchiseId"]] = int(item.get("openComplaints", 0))
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+        else:
+            raise RuntimeError(
+                f"{len(request[table_name]['Keys'])} franchise load counter(s) unread after {MAX_READ_ATTEMPTS} attempts"
+            )
+    return load
 
-        assignedFranchiseId = next(attr['Value'] for attr in selected['Attributes'] if attr['Name'] == 'sub')
-        assignedFranchiseEmail = next((attr['Value'] for attr in selected['Attributes'] if attr['Name'] == 'email'), None)
+def current_roster():
+    """
+    The cached roster, refreshed (members and their load) once the TTL lapses
+    """
+    if roster["expiresAt"] <= time.monotonic():
+        members = fetch_franchise_members()
+        roster["load"] = fetch_open_complaints(list(members))
+        roster["members"] = members
+        roster["expiresAt"] = time.monotonic() + ROSTER_TTL_SECONDS
+        logger.info("Refreshed franchise roster: %d member(s)", len(members))
+    return roster
 
-        log_entry = {
-            "messageId": message["messageId"],
-            "bookingRef": message["bookingRef"],
-            "userId": message["userId"],
-            "complaint": message["complaint"],
-            "assignedFranchiseId": assignedFranchiseId,
-            "assignedFranchiseEmail": assignedFranchiseEmail,
-            "timestampUTC": datetime.utcnow().isoformat() + "Z",
-            "status": "forwarded"
-        }
+def assign_franchise():
+    """
+    Pick the franchise user with the fewest open complaints (ties broken at
+    random) and count the new complaint against them atomically.
+    Returns (franchise ID, franchise email).
+    """
+    current = current_roster()
+    if not current["members"]:
+        raise RuntimeError("No franchise users to assign the complaint to")
 
-        logger.info("Logging complaint to DynamoDB: %s", log_entry)
+    fewest = min(current["load"].values())
+    candidates = [franchise_id for franchise_id, count in current["load"].items() if count == fewest]
+    franchise_id = random.choice(candidates)
 
-        table.put_item(Item=log_entry)
+    response = load_table().update_item(
+        Key={"franchiseId": franchise_id},
+        UpdateExpression="ADD openComplaints :one",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW"
+    )
+    # Keep the snapshot in step with other containers' assignments too
+    current["load"][franchise_id] = int(response["Attributes"]["openComplaints"])
+    return franchise_id, current["members"][franchise_id]
 
-        return {"statusCode": 200}
+def release_franchise(franchise_id):
+    """
+    Undo an assignment whose complaint could not be logged (it will be retried)
+    """
+    load_table().update_item(
+        Key={"franchiseId": franchise_id},
+        UpdateExpression="ADD openComplaints :minusOne",
+        ExpressionAttributeValues={":minusOne": -1}
+    )
+    roster["load"][franchise_id] = roster["load"].get(franchise_id, 1) - 1
 
+def record_message(record):
+    """
+    Return (item identifier, complaint message) for an SQS or SNS record.
+    SQS bodies are the raw SNS message (raw delivery) or the SNS envelope.
+    """
+    if "Sns" in record:
+        return record["Sns"]["MessageId"], json.loads(record["Sns"]["Message"])
+    body = json.loads(record["body"])
+    if "Message" in body and "TopicArn" in body:
+        body = json.loads(body["Message"])
+    return record["messageId"], body
+
+def put_log_entry(client, table_name, entry):
+    """
+    Write one log entry unless the complaint is already logged. Returns
+    "created", "exists" or "failed"; throttling is retried by the client.
+    """
+    try:
+        client.put_item(TableName=table_name, Item=entry, ConditionExpression="attribute_not_exists(messageId)")
+        return "created"
+    except client.exceptions.ConditionalCheckFailedException:
+        return "exists"
     except Exception as e:
-        logger.error("Error processing complaint: %s", str(e), exc_info=True)
-        return {"statusCode": 500}
\ No newline at end of file
+        logger.error("Writing complaint log %s failed: %s", entry["messageId"], str(e))
+        return "failed"
+
+def write_log_entries(entries):
+    """
+    Write {item identifier: log entry} with one conditional put per entry, in
+    parallel: BatchWriteItem cannot carry a condition, and a redelivered
+    complaint must not overwrite its log (it may have been answered since).
+    Returns (identifiers not written, identifiers already logged).
+    """
+    if not entries:
+        return set(), set()
+    # The client is thread-safe, unlike the Table resource
+    client = complaints_table().meta.client
+    table_name = complaints_table().name
+    with ThreadPoolExecutor(max_workers=min(len(entries), LOG_WRITE_WORKERS)) as executor:
+        outcomes = dict(zip(entries, executor.map(
+            lambda entry: put_log_entry(client, table_name, entry), entries.values()
+        )))
+    failed = {identifier for identifier, outcome in outcomes.items() if outcome == "failed"}
+    existing = {identifier for identifier, outcome in outcomes.items() if outcome == "exists"}
+    return failed, existing
+
+def lambda_handler(event, context):
+    """
+    Route every complaint in the batch. Failed records are reported in
+    batchItemFailures, so the queue only redelivers those.
+    """
+    logger.info("Received %d record(s)", len(event.get("Records", [])))
+
+    failures = []
+    entries = {}
+    assignments = {}
+    seen_messages = set()
+    for record in event.get("Records", []):
+        identifier = record.get("messageId") or record.get("Sns", {}).get("MessageId")
+        try:
+            identifier, message = record_message(record)
+            if message["messageId"] in seen_messages:
+                continue  # duplicate delivery within the batch
+            seen_messages.add(message["messageId"])
+
+            assignedFranchiseId, assignedFranchiseEmail = assign_franchise()
+            assignments[identifier] = assignedFranchiseId
+            logger.info("Complaint %s assigned to franchise user %s", message["messageId"], assignedFranchiseId)
+
+            entries[identifier] = {
+                "messageId": message["messageId"],
+                "bookingRef": message["bookingRef"],
+                "userId": message["userId"],
+                "complaint": message["complaint"],
+                "assignedFranchiseId": assignedFranchiseId,
+                "assignedFranchiseEmail": assignedFranchiseEmail,
+                "timestampUTC": datetime.utcnow().isoformat() + "Z",
+                "status": "forwarded"
+            }
+        except Exception as e:
+            logger.error("Error routing record %s: %s", identifier, str(e), exc_info=True)
+            failures.append(identifier)
+
+    unwritten, already_logged = write_log_entries(entries)
+    # Only complaints logged by this invocation keep their assignment: a
+    # redelivered one was counted (and maybe answered) the first time
+    for identifier in unwritten | already_logged:
+        if identifier in unwritten:
+            logger.error("Complaint log for record %s was not written", identifier)
+            failures.append(identifier)
+        else:
+            logger.info("Complaint for record %s was already logged", identifier)
+        try:
+            release_franchise(assignments[identifier])
+        except Exception as e:
+            logger.error("Error releasing assignment for record %s: %s", identifier, str(e))
+
+    logger.info("Routed %d complaint(s), %d already logged, %d failure(s)",
+                len(entries) - len(unwritten) - len(already_logged), len(already_logged), len(failures))
+    return {"batchItemFailures": [{"itemIdentifier": identifier} for identifier in failures]}
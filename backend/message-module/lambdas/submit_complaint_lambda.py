@@ -3,16 +3,21 @@ import boto3
 import os
 import uuid
 import logging
+from functools import lru_cache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Built on first use and reused by later invocations in the container
+@lru_cache(maxsize=None)
+def sns_client():
+    return boto3.client("sns")
+
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
 
     try:
         body = json.loads(event["body"])
-        sns = boto3.client("sns")
 
         user_id = event["requestContext"]["authorizer"]["jwt"]["claims"]["sub"]
         logger.info("Extracted userId from JWT: %s", user_id)
@@ -26,7 +31,7 @@ def lambda_handler(event, context):
 
         logger.info("Publishing message to SNS: %s", message)
 
-        sns.publish(
+        sns_client().publish(
             TopicArn=os.environ["SNS_TOPIC_ARN"],
             Message=json.dumps(message)
         )
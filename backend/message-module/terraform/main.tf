@@ -13,6 +13,67 @@ resource "aws_dynamodb_table" "complaint_logs" {
     name = "messageId"
     type = "S"
   }
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "assignedFranchiseId"
+    type = "S"
+  }
+
+  attribute {
+    name = "timestampUTC"
+    type = "S"
+  }
+
+  # Customer inbox, newest first
+  global_secondary_index {
+    name            = "UserComplaintsIndex"
+    hash_key        = "userId"
+    range_key       = "timestampUTC"
+    projection_type = "ALL"
+  }
+
+  # Franchise inbox, newest first
+  global_secondary_index {
+    name            = "FranchiseComplaintsIndex"
+    hash_key        = "assignedFranchiseId"
+    range_key       = "timestampUTC"
+    projection_type = "ALL"
+  }
+}
+
+# Complaint replies, one item per reply in posting order
+resource "aws_dynamodb_table" "complaint_replies" {
+  name         = "ComplaintReplies"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "complaintId"
+  range_key    = "replyKey"
+
+  attribute {
+    name = "complaintId"
+    type = "S"
+  }
+
+  attribute {
+    name = "replyKey"
+    type = "S"
+  }
+}
+
+# Open complaints per franchise user, for least-loaded complaint routing
+resource "aws_dynamodb_table" "franchise_load" {
+  name         = "FranchiseLoad"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "franchiseId"
+
+  attribute {
+    name = "franchiseId"
+    type = "S"
+  }
 }
 
 data "archive_file" "submit_complaint_zip" {
@@ -52,8 +113,9 @@ resource "aws_lambda_function" "route_complaint" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
-      USER_POOL_ID        = var.cognito_user_pool_id
+      DYNAMODB_TABLE_NAME  = aws_dynamodb_table.complaint_logs.name
+      FRANCHISE_LOAD_TABLE = aws_dynamodb_table.franchise_load.name
+      USER_POOL_ID         = var.cognito_user_pool_id
     }
   }
 }
@@ -95,7 +157,9 @@ resource "aws_lambda_function" "reply_complaint" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
+      DYNAMODB_TABLE_NAME  = aws_dynamodb_table.complaint_logs.name
+      FRANCHISE_LOAD_TABLE = aws_dynamodb_table.franchise_load.name
+      REPLIES_TABLE        = aws_dynamodb_table.complaint_replies.name
     }
   }
 }
@@ -117,23 +181,58 @@ resource "aws_lambda_function" "get_single_complaint" {
   environment {
     variables = {
       DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
+      USERS_TABLE         = "DALScooterUsers"
+      REPLIES_TABLE       = aws_dynamodb_table.complaint_replies.name
       USER_POOL_ID        = var.cognito_user_pool_id
     }
   }
 }
 
-resource "aws_sns_topic_subscription" "lambda_sub" {
-  topic_arn = aws_sns_topic.complaint_topic.arn
-  protocol  = "lambda"
-  endpoint  = aws_lambda_function.route_complaint.arn
+# Complaints reach the router through a queue, so it receives batches and
+# only the records it reports in batchItemFailures are redelivered
+resource "aws_sqs_queue" "complaint_routing_dlq" {
+  name                      = "complaint-routing-dlq"
+  message_retention_seconds = 1209600
 }
 
-resource "aws_lambda_permission" "allow_sns" {
-  statement_id  = "AllowExecutionFromSNS"
-  action        = "lambda:InvokeFunction"
-  function_name = aws_lambda_function.route_complaint.function_name
-  principal     = "sns.amazonaws.com"
-  source_arn    = aws_sns_topic.complaint_topic.arn
+resource "aws_sqs_queue" "complaint_routing" {
+  name                       = "complaint-routing"
+  visibility_timeout_seconds = 360
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.complaint_routing_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue_policy" "complaint_routing" {
+  queue_url = aws_sqs_queue.complaint_routing.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect    = "Allow"
+      Principal = { Service = "sns.amazonaws.com" }
+      Action    = "sqs:SendMessage"
+      Resource  = aws_sqs_queue.complaint_routing.arn
+      Condition = { ArnEquals = { "aws:SourceArn" = aws_sns_topic.complaint_topic.arn } }
+    }]
+  })
+}
+
+resource "aws_sns_topic_subscription" "routing_queue_sub" {
+  topic_arn            = aws_sns_topic.complaint_topic.arn
+  protocol             = "sqs"
+  endpoint             = aws_sqs_queue.complaint_routing.arn
+  raw_message_delivery = true
+}
+
+resource "aws_lambda_event_source_mapping" "route_complaint_queue" {
+  event_source_arn                   = aws_sqs_queue.complaint_routing.arn
+  function_name                      = aws_lambda_function.route_complaint.arn
+  batch_size                         = 25
+  maximum_batching_window_in_seconds = 2
+  function_response_types            = ["ReportBatchItemFailures"]
 }
 
 # --- HTTP API Gateway ---
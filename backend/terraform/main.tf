@@ -45,6 +45,9 @@ module "dashboard_module" {
   source                        = "../dashboard-module/terraform"
   aws_region                    = var.aws_region
   cognito_user_pool_id          = module.auth_module.user_pool_id
+  users_table_stream_arn        = module.auth_module.users_table_stream_arn
+  user_logins_table_stream_arn  = module.auth_module.user_logins_table_stream_arn
+  bookings_table_stream_arn     = module.booking_module.bookings_table_stream_arn
 }
 
 module "message_module" {
@@ -0,0 +1,155 @@
+"""
+Cold and warm invocation timing for the booking Lambda handlers
+
+For each booking handler, a fresh interpreter imports the handler and invokes it
+once (cold: init plus first invocation, without interpreter startup), then
+invokes it again `--warm` times (warm: median per invocation). Cold figures are
+the median over `--runs` fresh interpreters. With `--baseline REV` the same
+handlers are also timed as they were at that git revision, e.g. the commit
+before the shared layer, and the two are printed side by side.
+
+Usage (from backend/, with DynamoDB Local on port 8000 and the tables from
+`python tools/booking_stress.py --create-tables`):
+    python tools/bench_invocation.py
+    python tools/bench_invocation.py --baseline 7613ed8 --runs 7 --warm 50
+
+The events only take read paths (missing bookings and bikes, the admin
+listing), so the tables are not modified.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from check_import_budget import PLACEHOLDER_ENV  # noqa: E402
+
+CLAIMS = {'jwt': {'claims': {'sub': 'bench-user', 'email': 'bench@example.com', 'cognito:groups': ''}}}
+ADMIN_CLAIMS = {'jwt': {'claims': {'sub': 'bench-admin', 'email': 'bench@example.com', 'cognito:groups': 'BikeFranchise'}}}
+
+# Handler module -> event it is invoked with
+EVENTS = {
+    'create_booking_lambda': {
+        'requestContext': {'authorizer': CLAIMS},
+        'body': json.dumps({
+            'bikeId': 'bench-missing-bike',
+            'startDate': '2999-01-01T10:00:00Z',
+            'endDate': '2999-01-01T11:00:00Z',
+            'duration': 1
+        })
+    },
+    'get_bookings_lambda': {
+        'requestContext': {'authorizer': ADMIN_CLAIMS},
+        'queryStringParameters': {'limit': '20'}
+    },
+    'get_booking_details_lambda': {
+        'requestContext': {'authorizer': CLAIMS},
+        'pathParameters': {'bookingId': 'bench-missing-booking'}
+    },
+    'update_booking_lambda': {
+        'requestContext': {'authorizer': CLAIMS},
+        'pathParameters': {'bookingId': 'bench-missing-booking'},
+        'body': json.dumps({'notes': 'bench'})
+    },
+    'cancel_booking_lambda': {
+        'requestContext': {'authorizer': CLAIMS},
+        'pathParameters': {'bookingId': 'bench-missing-booking'}
+    },
+}
+
+# Runs in the fresh interpreter: argv is module, event JSON, warm invocations
+DRIVER = """
+import json, statistics, sys, time
+module, event, warm = sys.argv[1], json.loads(sys.argv[2]), int(sys.argv[3])
+started = time.perf_counter()
+handler = __import__(module).lambda_handler
+status = handler(event, None)['statusCode']
+cold_ms = (time.perf_counter() - started) * 1000
+timings = []
+for _ in range(warm):
+    started = time.perf_counter()
+    handler(event, None)
+    timings.append((time.perf_counter() - started) * 1000)
+print(json.dumps({'status': status, 'cold_ms': cold_ms, 'warm_ms': statistics.median(timings) if timings else None}))
+"""
+
+def search_path(backend_dir):
+    module_dir = os.path.join(backend_dir, 'booking-module')
+    paths = [os.path.join(module_dir, 'lambdas')]
+    # Trees from before the shared layer have no layer directory
+    layer_dir = os.path.join(module_dir, 'layer', 'python')
+    if os.path.isdir(layer_dir):
+        paths.append(layer_dir)
+    return paths
+
+def time_handler(backend_dir, module, args):
+    """
+    Return (status code, median cold ms, median warm ms) for one handler
+    """
+    env = dict(os.environ)
+    for name, value in PLACEHOLDER_ENV.items():
+        env.setdefault(name, value)
+    # Required by older trees, where the layer's default did not exist yet
+    env.setdefault('SLOTS_TABLE', 'DALScooterBikeSlots')
+    env['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    env['PYTHONPATH'] = os.pathsep.join(search_path(backend_dir))
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, '-c', DRIVER, module, json.dumps(EVENTS[module]), str(args.warm)],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f'{module} failed:\n{result.stderr.strip()[-2000:]}')
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return (
+        samples[-1]['status'],
+        statistics.median(sample['cold_ms'] for sample in samples),
+        statistics.median(sample['warm_ms'] for sample in samples)
+    )
+
+def extract_revision(revision, destination):
+    """
+    Unpack backend/ as of a git revision and return its path
+    """
+    repo_root = subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    backend = os.path.relpath(BACKEND_DIR, repo_root).replace(os.sep, '/')
+    archive = subprocess.run(['git', 'archive', revision, backend], cwd=repo_root, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination)
+    return os.path.join(destination, backend)
+
+def main():
+    parser = argparse.ArgumentParser(description='Time cold and warm invocations of the booking handlers')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--baseline', help='git revision to compare against')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per handler (median cold time)')
+    parser.add_argument('--warm', type=int, default=20, help='warm invocations per interpreter (median)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        trees = [('current', BACKEND_DIR)]
+        if args.baseline:
+            trees.insert(0, (args.baseline, extract_revision(args.baseline, scratch)))
+
+        header = f"{'handler':<28}" + ''.join(f'{label + " cold":>16}{label + " warm":>16}' for label, _ in trees)
+        print(header)
+        for module in EVENTS:
+            row = f'{module:<28}'
+            for _, backend_dir in trees:
+                status, cold_ms, warm_ms = time_handler(backend_dir, module, args)
+                row += f'{cold_ms:13.1f} ms{warm_ms:13.2f} ms'
+            print(f'{row}   [{status}]')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
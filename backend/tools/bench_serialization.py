@@ -0,0 +1,139 @@
+"""
+Serialization micro-benchmark for the booking and bike listings
+
+Times turning one page of raw DynamoDB rows into a response body, the work
+get_bookings_lambda and GET /bikes do per page:
+
+  bookings  low-level items -> Booking.from_dynamo().to_api() -> dumps()
+  bikes     low-level items -> from_item() -> dumps()
+
+Each is timed with the serializer the handlers use, once with orjson (when it
+is installed) and once with the standard-library fallback. The baseline is the
+resource-API path: boto3's TypeDeserializer turns every attribute into Python
+values (numbers as Decimal), then stdlib json.dumps converts each Decimal
+through a default= hook.
+
+Usage (from backend/):
+    python tools/bench_serialization.py
+    python tools/bench_serialization.py --rows 5000 --repeat 30
+
+No AWS access is needed; the rows are synthetic.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(BACKEND_DIR, 'booking-module', 'layer', 'python'),
+    os.path.join(BACKEND_DIR, 'bike-module', 'lambdas')
+]
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from check_import_budget import PLACEHOLDER_ENV  # noqa: E402
+
+def booking_rows(count):
+    return [
+        {
+            'bookingId': {'S': f'00000000-0000-4000-8000-{i:012d}'},
+            'userId': {'S': f'user-{i % 97}'},
+            'userEmail': {'S': f'user{i % 97}@example.com'},
+            'bikeId': {'S': f'bike-{i % 40}'},
+            'startDate': {'S': '2026-05-01T10:00:00Z'},
+            'endDate': {'S': '2026-05-01T12:00:00Z'},
+            'duration': {'N': '2'},
+            'status': {'S': 'active'},
+            'notes': {'S': 'Helmet size M'},
+            'createdAt': {'S': '2026-04-20T08:15:00.123456+00:00'},
+            'updatedAt': {'S': '2026-04-20T08:15:00.123456+00:00'},
+            'bikeModel': {'S': 'Segway Ninebot'},
+            'bikeType': {'S': 'eScooter'},
+            'bookingDate': {'S': '2026-05-01'},
+            'recordType': {'S': 'booking'}
+        }
+        for i in range(count)
+    ]
+
+def bike_rows(count):
+    return [
+        {
+            'bikeId': {'S': f'bike-{i}'},
+            'type': {'S': 'eBike'},
+            'model': {'S': 'Trek Allant+'},
+            'batteryLife': {'N': str(80 + i % 20)},
+            'hourlyRate': {'N': '4.5'},
+            'discount': {'S': '10%'},
+            'features': {'L': [{'S': 'GPS'}, {'S': 'Lights'}, {'S': 'Basket'}]},
+            'status': {'S': 'available'},
+            'version': {'N': str(i % 7 + 1)}
+        }
+        for i in range(count)
+    ]
+
+def median_ms(function, repeat):
+    function()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Time response serialization for booking and bike listings')
+    parser.add_argument('--rows', type=int, default=1000, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per case (median)')
+    args = parser.parse_args()
+
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+    import booking_common as common
+    import bike_crud_handler as bikes
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    fast = common.orjson
+    booking_page = booking_rows(args.rows)
+    bike_page = bike_rows(args.rows)
+    baseline_dumps = lambda body: json.dumps(body, default=bikes.decimal_default)
+    resource_items = lambda page: [{key: deserializer.deserialize(value) for key, value in item.items()} for item in page]
+
+    def with_serializer(module, serializer, body):
+        def run():
+            saved, module.orjson = module.orjson, serializer
+            try:
+                return body()
+            finally:
+                module.orjson = saved
+        return run
+
+    cases = [
+        ('bookings', 'baseline', lambda: baseline_dumps({'bookings': resource_items(booking_page)})),
+        ('bookings', 'stdlib', with_serializer(common, None, lambda: common.dumps(
+            {'bookings': [common.Booking.from_dynamo(item).to_api() for item in booking_page]}
+        ))),
+        ('bikes', 'baseline', lambda: baseline_dumps(resource_items(bike_page))),
+        ('bikes', 'stdlib', with_serializer(bikes, None, lambda: bikes.dumps([bikes.from_item(item) for item in bike_page]))),
+    ]
+    if fast is not None:
+        cases.insert(2, ('bookings', 'orjson', with_serializer(common, fast, lambda: common.dumps(
+            {'bookings': [common.Booking.from_dynamo(item).to_api() for item in booking_page]}
+        ))))
+        cases.append(('bikes', 'orjson', with_serializer(bikes, fast, lambda: bikes.dumps(
+            [bikes.from_item(item) for item in bike_page]
+        ))))
+    else:
+        print('orjson is not installed: only the stdlib fallback is timed', file=sys.stderr)
+
+    print(f"{'listing':<10}{'path':<10}{'ms/page':>10}{'speedup':>10}   ({args.rows} rows, median of {args.repeat})")
+    baselines = {}
+    for listing, path, run in cases:
+        elapsed = median_ms(run, args.repeat)
+        baselines.setdefault(listing, elapsed)
+        print(f'{listing:<10}{path:<10}{elapsed:10.2f}{baselines[listing] / elapsed:9.1f}x')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
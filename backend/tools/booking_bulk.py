@@ -0,0 +1,346 @@
+"""
+Bulk import and export for DALScooterBookings
+
+Moves bookings in and out of the table without replaying them through the
+booking API one request at a time.
+
+  export  Parallel segmented scan, streamed as NDJSON or CSV
+  import  Streams NDJSON or CSV, rejects repeated bookingIds, then writes
+          every booking together with its slot claims in one conditional
+          TransactWriteItems from a worker pool, like create_booking: a
+          bookingId that already exists or a slot already claimed (by an
+          existing booking, an earlier row or live API traffic) cancels that
+          booking's write and the row is rejected
+
+Usage (from backend/):
+    python tools/booking_bulk.py export --format csv --output bookings.csv
+    python tools/booking_bulk.py import --input bookings.ndjson --rejects rejects.ndjson
+    python tools/booking_bulk.py --format csv --endpoint-url http://localhost:8000 import --input bookings.csv
+
+--endpoint-url points the tool at DynamoDB Local (or any stand-in) for
+rehearsing a migration. Rows use the API field names of a booking; bookingId,
+status, duration, createdAt and updatedAt are filled in when missing.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'booking-module', 'layer', 'python'))
+
+# Backoff for throttled or contended transactions: full jitter, doubling from
+# BASE up to MAX seconds
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 5.0
+REQUIRED_FIELDS = ('userId', 'bikeId', 'startDate', 'endDate')
+
+def open_output(path):
+    return open(path, 'w', newline='') if path and path != '-' else sys.stdout
+
+def open_input(path):
+    return open(path, newline='') if path and path != '-' else sys.stdin
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def export_bookings(common, args):
+    """
+    Scan the table in parallel segments and stream every booking out. Items
+    that are not a valid booking (e.g. missing a required attribute) are
+    skipped and reported, and make the export exit non-zero.
+    """
+    fields = [name for name, _, _ in common.BOOKING_SCHEMA]
+    output = open_output(args.output)
+    lock = threading.Lock()
+    if args.format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        write = lambda booking: output.write(json.dumps(booking) + '\n')
+
+    def scan_segment(segment):
+        scan_params = {
+            'TableName': args.bookings_table,
+            'Segment': segment,
+            'TotalSegments': args.segments
+        }
+        count = skipped = 0
+        while True:
+            response = common.dynamodb.scan(**scan_params)
+            bookings = []
+            for item in response.get('Items', []):
+                try:
+                    bookings.append(common.Booking.from_dynamo(item).to_api())
+                except (KeyError, ValueError, TypeError) as e:
+                    skipped += 1
+                    booking_id = item.get('bookingId', {}).get('S', '<no bookingId>')
+                    print(f'Skipped malformed booking {booking_id}: {type(e).__name__} {e}', file=sys.stderr)
+            with lock:
+                for booking in bookings:
+                    write(booking)
+            count += len(bookings)
+            if 'LastEvaluatedKey' not in response:
+                return count, skipped
+            scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        results = list(executor.map(scan_segment, range(args.segments)))
+    if output is not sys.stdout:
+        output.close()
+    total = sum(count for count, _ in results)
+    skipped = sum(skipped for _, skipped in results)
+    print(f'Exported {total} booking(s), skipped {skipped} malformed', file=sys.stderr)
+    return 1 if skipped else 0
+
+def parse_utc(value):
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Naive timestamps are taken as UTC, like the Lambda clock
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def booking_item(common, row, now):
+    """
+    Turn an import row into a low-level booking item, filling defaults the way
+    create_booking does. Raises ValueError for an unusable row.
+    """
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        raise ValueError(f'missing {", ".join(missing)}')
+    start_datetime = parse_utc(row['startDate'])
+    end_datetime = parse_utc(row['endDate'])
+    if start_datetime >= end_datetime:
+        raise ValueError('startDate must be before endDate')
+
+    duration = row.get('duration')
+    if duration is None:
+        duration = max(1, round((end_datetime - start_datetime).total_seconds() / 3600))
+    elif common.parse_duration(duration) is None:
+        raise ValueError('duration must be a positive whole number of hours')
+    created_at = row.get('createdAt', now)
+    item = {
+        'bookingId': {'S': row.get('bookingId') or str(uuid.uuid4())},
+        'userId': {'S': row['userId']},
+        'userEmail': {'S': row.get('userEmail', '')},
+        'bikeId': {'S': row['bikeId']},
+        'startDate': {'S': row['startDate']},
+        'endDate': {'S': row['endDate']},
+        'duration': {'N': str(common.parse_duration(duration))},
+        'status': {'S': row.get('status', 'active')},
+        'notes': {'S': row.get('notes', '')},
+        'createdAt': {'S': created_at},
+        'updatedAt': {'S': row.get('updatedAt', created_at)},
+        'bikeModel': {'S': row.get('bikeModel', 'Unknown')},
+        'bikeType': {'S': row.get('bikeType', 'Unknown')},
+        'bookingDate': {'S': row['startDate'].split('T')[0]},
+        'recordType': {'S': 'booking'}
+    }
+    return item, start_datetime, end_datetime
+
+class TransactionWriter:
+    """
+    Writes one booking and its slot claims per TransactWriteItems request from
+    a worker pool. At most `max_in_flight` bookings are outstanding, which
+    bounds memory while the input is streamed; finished ones are handed back
+    in submission order by `results()` and `close()`.
+    """
+    def __init__(self, common, workers, max_attempts):
+        self.common = common
+        self.max_attempts = max_attempts
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_in_flight = workers * 4
+        self.in_flight = deque()
+
+    def write(self, line_number, row, transact_items):
+        self.in_flight.append(self.executor.submit(self._write, line_number, row, transact_items))
+
+    def results(self):
+        """
+        Yield (line number, row, outcome, detail) until the pool has room again
+        """
+        while len(self.in_flight) >= self.max_in_flight:
+            yield self.in_flight.popleft().result()
+
+    def _write(self, line_number, row, transact_items):
+        dynamodb = self.common.dynamodb
+        for attempt in range(self.max_attempts):
+            try:
+                dynamodb.transact_write_items(TransactItems=transact_items)
+                return line_number, row, 'written', None
+            except dynamodb.exceptions.TransactionCanceledException as e:
+                reasons = e.response.get('CancellationReasons', [])
+                if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                    return line_number, row, 'rejected', 'bookingId already exists'
+                conflicting_slot = self.common.conflicting_claim(e)
+                if conflicting_slot is not None:
+                    return line_number, row, 'rejected', (
+                        f"overlaps booking {conflicting_slot['bookingId']['S']} at {conflicting_slot['slotStart']['S']}"
+                    )
+                # Throttled or contended with another transaction: retry
+                detail = str(e)
+            except Exception as e:
+                return line_number, row, 'failed', str(e)
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+        return line_number, row, 'failed', f'{detail} (after {self.max_attempts} attempts)'
+
+    def close(self):
+        while self.in_flight:
+            yield self.in_flight.popleft().result()
+        self.executor.shutdown()
+
+def booking_exists(common, args, booking_id):
+    response = common.dynamodb.get_item(
+        TableName=args.bookings_table,
+        Key={'bookingId': {'S': booking_id}},
+        ProjectionExpression='bookingId'
+    )
+    return 'Item' in response
+
+def import_bookings(common, args):
+    """
+    Stream rows in, reject repeated bookingIds and overlaps per bike, and write
+    each booking with its claims in one conditional transaction.
+
+    Overlaps are caught by the conditional claims themselves, against the
+    table and against rows imported earlier, so nothing per bike is kept in
+    memory. Of two overlapping input rows, the one that commits first wins.
+    A dry run writes nothing, so it reads the claims of each row's own window
+    and remembers only the slots the input would claim.
+    """
+    now = datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    # Dry run only: {bike ID: slots claimed by accepted rows}
+    input_slots = {}
+    # bookingIds given in the input, to reject a repeated one
+    seen_ids = set()
+    writer = None if args.dry_run else TransactionWriter(common, args.workers, args.max_attempts)
+    rejects = open_output(args.rejects) if args.rejects else None
+    counts = {'written': 0, 'rejected': 0, 'failed': 0}
+    claimed_bikes = set()
+
+    def record(line_number, row, outcome, detail):
+        counts[outcome] += 1
+        if outcome != 'written' and rejects is not None:
+            rejects.write(json.dumps({'line': line_number, 'reason': detail, 'row': row}) + '\n')
+
+    with open_input(args.input) as stream:
+        for line_number, row in enumerate(read_rows(stream, args.format), start=1):
+            try:
+                item, start_datetime, end_datetime = booking_item(common, row, now_iso)
+            except (ValueError, TypeError) as e:
+                record(line_number, row, 'rejected', str(e))
+                continue
+
+            booking_id = item['bookingId']['S']
+            bike_id = item['bikeId']['S']
+            if row.get('bookingId'):
+                if booking_id in seen_ids:
+                    record(line_number, row, 'rejected', f'bookingId {booking_id} appears earlier in the input')
+                    continue
+                seen_ids.add(booking_id)
+                # The transaction checks this too; a dry run has no transaction
+                if writer is None and booking_exists(common, args, booking_id):
+                    record(line_number, row, 'rejected', 'bookingId already exists')
+                    continue
+
+            slots = common.booking_slots(start_datetime, end_datetime) if item['status']['S'] == 'active' else []
+            # Claims only matter until the booking ends (TTL removes them after)
+            claimed = slots if end_datetime > now else []
+            if len(claimed) > common.MAX_TRANSACTION_ITEMS - 1:
+                record(line_number, row, 'rejected', (
+                    f'needs {len(claimed)} slot claims; at most {common.MAX_TRANSACTION_ITEMS - 1} fit in one transaction'
+                ))
+                continue
+            if writer is None:
+                if claimed:
+                    taken = input_slots.setdefault(bike_id, set())
+                    overlap = next((slot for slot in claimed if slot in taken), None)
+                    if overlap is not None:
+                        record(line_number, row, 'rejected', f'overlaps an earlier row for bike {bike_id} at {overlap}')
+                        continue
+                    existing = next(common.iter_claims(bike_id, claimed, projection='slotStart, bookingId'), None)
+                    if existing is not None:
+                        record(line_number, row, 'rejected', (
+                            f"overlaps booking {existing['bookingId']['S']} at {existing['slotStart']['S']}"
+                        ))
+                        continue
+                    taken.update(claimed)
+                counts['written'] += 1
+                continue
+            if claimed:
+                claimed_bikes.add(bike_id)
+            writer.write(line_number, row, [
+                {
+                    'Put': {
+                        'TableName': args.bookings_table,
+                        'Item': item,
+                        'ConditionExpression': 'attribute_not_exists(bookingId)'
+                    }
+                }
+            ] + common.slot_claims(
+                bike_id, booking_id, item['startDate']['S'], item['endDate']['S'],
+                claimed, int(end_datetime.timestamp())
+            ))
+            for result in writer.results():
+                record(*result)
+
+    if writer is not None:
+        for result in writer.close():
+            record(*result)
+        # Retire cached availability answers for every bike that gained claims
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(common.bump_slot_generation, claimed_bikes))
+
+    if rejects is not None and rejects is not sys.stdout:
+        rejects.close()
+
+    verb = 'Would import' if writer is None else 'Imported'
+    print(f"{verb} {counts['written']} booking(s), rejected {counts['rejected']}, "
+          f"failed {counts['failed']} after {args.max_attempts} attempts", file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import/export of DALScooterBookings')
+    parser.add_argument('--bookings-table', default=os.environ.get('BOOKINGS_TABLE', 'DALScooterBookings'))
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--workers', type=int, default=16)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='stream every booking out')
+    export_parser.add_argument('--output', default='-')
+    export_parser.add_argument('--segments', type=int, default=8, help='parallel scan segments')
+
+    import_parser = commands.add_parser('import', help='stream bookings in')
+    import_parser.add_argument('--input', default='-')
+    import_parser.add_argument('--rejects', help='NDJSON file for rows that were not imported')
+    import_parser.add_argument('--max-attempts', type=int, default=8, help='transaction attempts per booking')
+    import_parser.add_argument('--dry-run', action='store_true', help='validate and check conflicts only')
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    os.environ.setdefault('MAX_POOL_CONNECTIONS', str(max(args.workers, getattr(args, 'segments', 0))))
+    # Imported late so the endpoint and pool size apply to the shared client
+    import booking_common as common
+
+    if args.command == 'export':
+        return export_bookings(common, args)
+    return import_bookings(common, args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Round-trip check for booking_bulk.py against a local DynamoDB
+
+Seeds a fresh bookings table (future, past and cancelled bookings on a few
+bikes, plus one item missing a required attribute), exports it, imports the
+export into another fresh pair of tables and exports that again. Fails unless:
+
+  - the malformed item is skipped and reported, and the export exits non-zero
+  - both exports hold the same bookings, in NDJSON and in CSV
+  - the import claimed exactly the slots of the future active bookings
+  - importing the same file again writes nothing
+  - a row overlapping an imported booking is rejected, with and without --dry-run
+
+It runs booking_bulk.py as a subprocess, the way it is used for a migration.
+
+Usage (from backend/, with DynamoDB Local on port 8000):
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python tools/booking_bulk_check.py
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+from booking_stress import create_tables  # noqa: E402
+
+def iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def seed_bookings(common, table_name, count):
+    """
+    Write `count` valid bookings and one malformed item; returns the valid
+    items' (bikeId, startDate, endDate) for every booking that should hold claims
+    """
+    first_hour = (datetime.now(timezone.utc) + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    claiming = []
+    for i in range(count):
+        bike_id = f'bulk-bike-{i % 5}'
+        kind = ('active', 'active', 'past', 'cancelled')[i % 4]
+        start = first_hour + timedelta(hours=2 * (i // 5)) if kind != 'past' else first_hour - timedelta(days=3, hours=i)
+        end = start + timedelta(hours=1, minutes=30)
+        created_at = datetime(2026, 1, 1, tzinfo=timezone.utc).isoformat()
+        common.dynamodb.put_item(TableName=table_name, Item={
+            'bookingId': {'S': str(uuid.uuid4())},
+            'userId': {'S': f'bulk-user-{i % 7}'},
+            'userEmail': {'S': f'user{i % 7}@example.com'},
+            'bikeId': {'S': bike_id},
+            'startDate': {'S': iso(start)},
+            'endDate': {'S': iso(end)},
+            'duration': {'N': '2'},
+            'status': {'S': 'cancelled' if kind == 'cancelled' else 'active'},
+            'notes': {'S': f'row {i}' if i % 3 else ''},
+            'createdAt': {'S': created_at},
+            'updatedAt': {'S': created_at},
+            'bikeModel': {'S': 'Bulk'},
+            'bikeType': {'S': 'eBike'},
+            'bookingDate': {'S': iso(start).split('T')[0]},
+            'recordType': {'S': 'booking'}
+        })
+        if kind == 'active':
+            claiming.append((bike_id, start, end))
+    common.dynamodb.put_item(TableName=table_name, Item={
+        'bookingId': {'S': f'malformed-{uuid.uuid4()}'},
+        'bikeId': {'S': 'bulk-bike-0'},
+        'startDate': {'S': iso(first_hour)}
+    })
+    return claiming
+
+def run_bulk(args, slots_table, bookings_table, fmt, *command):
+    """
+    Run booking_bulk.py and return (exit code, stderr)
+    """
+    env = dict(os.environ, SLOTS_TABLE=slots_table)
+    result = subprocess.run(
+        [sys.executable, os.path.join(TOOLS_DIR, 'booking_bulk.py'), '--endpoint-url', args.endpoint_url,
+         '--bookings-table', bookings_table, '--format', fmt, *command],
+        env=env, capture_output=True, text=True
+    )
+    return result.returncode, result.stderr
+
+def read_export(path, fmt):
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            return {row['bookingId']: row for row in csv.DictReader(f)}
+        return {
+            booking['bookingId']: {key: str(value) for key, value in booking.items()}
+            for booking in map(json.loads, f)
+        }
+
+def count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return sum(1 for line in f if line.strip())
+
+def slot_count(common, table_name):
+    scan_params = {'TableName': table_name, 'Select': 'COUNT'}
+    total = 0
+    while True:
+        response = common.dynamodb.scan(**scan_params)
+        total += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return total
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def check_format(common, args, workdir, fmt, source, source_slots, claiming):
+    problems = []
+    suffix = uuid.uuid4().hex[:8]
+    target, target_slots = f'bulk-target-{suffix}', f'bulk-target-slots-{suffix}'
+    create_tables(common.dynamodb, target, target_slots)
+
+    exported = os.path.join(workdir, f'source.{fmt}')
+    code, stderr = run_bulk(args, source_slots, source, fmt, 'export', '--output', exported)
+    if code != 1 or 'Skipped malformed booking malformed-' not in stderr:
+        problems.append(f'{fmt}: export of a table with a malformed item exited {code}: {stderr.strip()}')
+
+    rejects = os.path.join(workdir, f'rejects.{fmt}.ndjson')
+    code, stderr = run_bulk(args, target_slots, target, fmt, 'import', '--input', exported, '--rejects', rejects)
+    if code != 0 or count_lines(rejects):
+        problems.append(f'{fmt}: import exited {code} with {count_lines(rejects)} reject(s): {stderr.strip()}')
+
+    reexported = os.path.join(workdir, f'target.{fmt}')
+    run_bulk(args, target_slots, target, fmt, 'export', '--output', reexported)
+    before, after = read_export(exported, fmt), read_export(reexported, fmt)
+    if len(before) != args.bookings:
+        problems.append(f'{fmt}: exported {len(before)} booking(s), expected {args.bookings}')
+    changed = sorted(booking_id for booking_id in before.keys() | after.keys() if before.get(booking_id) != after.get(booking_id))
+    if changed:
+        problems.append(f'{fmt}: {len(changed)} booking(s) differ after the round trip, e.g. {changed[0]}')
+
+    expected_slots = sum(len(common.booking_slots(start, end)) for _, start, end in claiming)
+    # Each bike that gained claims also has its generation counter
+    expected_slots += len({bike_id for bike_id, _, _ in claiming})
+    if slot_count(common, target_slots) != expected_slots:
+        problems.append(f'{fmt}: {slot_count(common, target_slots)} slot item(s) in the target, expected {expected_slots}')
+
+    rejects_again = os.path.join(workdir, f'rejects-again.{fmt}.ndjson')
+    run_bulk(args, target_slots, target, fmt, 'import', '--input', exported, '--rejects', rejects_again)
+    if count_lines(rejects_again) != len(before):
+        problems.append(f'{fmt}: re-import rejected {count_lines(rejects_again)} of {len(before)} row(s)')
+
+    bike_id, start, end = claiming[0]
+    overlapping = os.path.join(workdir, 'overlap.ndjson')
+    with open(overlapping, 'w') as f:
+        f.write(json.dumps({
+            'userId': 'bulk-overlap', 'bikeId': bike_id,
+            'startDate': iso(start + timedelta(minutes=30)), 'endDate': iso(end + timedelta(hours=1))
+        }) + '\n')
+    for dry_run in ([], ['--dry-run']):
+        rejected = os.path.join(workdir, 'overlap-rejects.ndjson')
+        run_bulk(args, target_slots, target, 'ndjson', 'import', '--input', overlapping, '--rejects', rejected, *dry_run)
+        if count_lines(rejected) != 1:
+            problems.append(f"{fmt}: overlapping row was not rejected{' in a dry run' if dry_run else ''}")
+        os.remove(rejected)
+
+    print(f'{fmt}: {len(before)} booking(s) round-tripped, {len(problems)} problem(s)', file=sys.stderr)
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Export, import and re-export bookings through booking_bulk.py')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--bookings', type=int, default=120, help='valid bookings to seed')
+    args = parser.parse_args()
+
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    # DynamoDB Local accepts any credentials
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bulk')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bulk')
+    # Imported late so the endpoint applies to the shared client
+    import booking_common as common
+
+    suffix = uuid.uuid4().hex[:8]
+    source, source_slots = f'bulk-source-{suffix}', f'bulk-source-slots-{suffix}'
+    create_tables(common.dynamodb, source, source_slots)
+    claiming = seed_bookings(common, source, args.bookings)
+
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for fmt in ('ndjson', 'csv'):
+            problems.extend(check_format(common, args, workdir, fmt, source, source_slots, claiming))
+
+    if problems:
+        print('\nBulk round-trip check failed:', file=sys.stderr)
+        for problem in problems:
+            print(f'  {problem}', file=sys.stderr)
+        return 1
+    print('Bookings round-trip through export and import', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
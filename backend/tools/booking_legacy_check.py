@@ -0,0 +1,153 @@
+"""
+Legacy double-booking check for cancel_booking and update_booking against a local DynamoDB
+
+Writes pairs of overlapping bookings straight into the bookings table, as they
+could exist before the slot index, and runs backfill_booking_slots: the first
+booking of each pair claims its slots and the second is reported as a
+conflict. Then, per pair, it cancels the conflicted booking or moves it to a
+free window and fails unless the call returns 200 and the first booking still
+holds every one of its slots.
+
+Usage (from backend/, with DynamoDB Local on port 8000):
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python tools/booking_legacy_check.py --create-tables
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from booking_stress import (  # noqa: E402
+    BOOKINGS_TABLE, SLOTS_TABLE, BIKE_INVENTORY_TABLE, DroppedNotifications, create_tables
+)
+
+def iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def request(user_id, booking_id, body=None):
+    event = {
+        'pathParameters': {'bookingId': booking_id},
+        'requestContext': {'authorizer': {'jwt': {'claims': {
+            'sub': user_id,
+            'email': 'legacy@example.com',
+            'cognito:groups': ''
+        }}}}
+    }
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+def put_legacy_booking(common, booking_id, bike_id, user_id, start, end):
+    common.dynamodb.put_item(TableName=BOOKINGS_TABLE, Item={
+        'bookingId': {'S': booking_id},
+        'userId': {'S': user_id},
+        'userEmail': {'S': 'legacy@example.com'},
+        'bikeId': {'S': bike_id},
+        'startDate': {'S': iso(start)},
+        'endDate': {'S': iso(end)},
+        'duration': {'N': str(max(1, round((end - start).total_seconds() / 3600)))},
+        'status': {'S': 'active'},
+        'createdAt': {'S': datetime.now(timezone.utc).isoformat()}
+    })
+
+def slot_owners(common, bike_id, start, end):
+    slots = common.booking_slots(start, end)
+    return {
+        claim['slotStart']['S']: claim['bookingId']['S']
+        for claim in common.iter_claims(bike_id, slots, projection='slotStart, bookingId')
+        if claim['slotStart']['S'] != common.GENERATION_KEY
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Cancel and reschedule bookings the slot backfill reported as conflicts')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--create-tables', action='store_true', help='create the booking tables if they are missing')
+    args = parser.parse_args()
+
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    # DynamoDB Local accepts any credentials
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'legacy')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'legacy')
+    os.environ.update({
+        'BOOKINGS_TABLE': BOOKINGS_TABLE,
+        'SLOTS_TABLE': SLOTS_TABLE,
+        'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE,
+        'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:legacy'
+    })
+    # Imported late so the endpoint applies to the shared client
+    import booking_common as common
+    common._clients['sns'] = DroppedNotifications()
+    import backfill_booking_slots
+    import cancel_booking_lambda
+    import update_booking_lambda
+
+    if args.create_tables:
+        create_tables(common.dynamodb)
+
+    first_slot = (datetime.now(timezone.utc) + timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+    user_id = f'legacy-{uuid.uuid4()}'
+    pairs = {}
+    for action in ('cancel', 'reschedule'):
+        bike_id = f'legacy-bike-{uuid.uuid4()}'
+        common.dynamodb.put_item(TableName=BIKE_INVENTORY_TABLE, Item={
+            'bikeId': {'S': bike_id},
+            'status': {'S': 'available'},
+            'model': {'S': 'Legacy'},
+            'type': {'S': 'eBike'},
+            'version': {'N': '1'}
+        })
+        # The earlier booking is written (and so backfilled) on its own first,
+        # so it is always the one that wins the overlapping slots
+        held_id, conflicted_id = str(uuid.uuid4()), str(uuid.uuid4())
+        put_legacy_booking(common, held_id, bike_id, user_id, first_slot, first_slot + timedelta(hours=1))
+        pairs[action] = (bike_id, held_id, conflicted_id)
+    backfill_booking_slots.lambda_handler({}, None)
+    for bike_id, _, conflicted_id in pairs.values():
+        put_legacy_booking(
+            common, conflicted_id, bike_id, user_id,
+            first_slot + timedelta(minutes=30), first_slot + timedelta(hours=2)
+        )
+    counts = backfill_booking_slots.lambda_handler({}, None)['counts']
+    print(f'Backfill: {counts}', file=sys.stderr)
+
+    problems = []
+    if counts['conflict'] < len(pairs):
+        problems.append(f"backfill reported {counts['conflict']} conflict(s), expected at least {len(pairs)}")
+
+    for action, (bike_id, held_id, conflicted_id) in pairs.items():
+        if action == 'cancel':
+            response = cancel_booking_lambda.lambda_handler(request(user_id, conflicted_id), None)
+        else:
+            moved_start = first_slot + timedelta(hours=5)
+            response = update_booking_lambda.lambda_handler(request(user_id, conflicted_id, {
+                'startDate': iso(moved_start),
+                'endDate': iso(moved_start + timedelta(hours=1)),
+                'duration': 1
+            }), None)
+        print(f"{action} conflicted booking: {response['statusCode']}", file=sys.stderr)
+        if response['statusCode'] != 200:
+            problems.append(f"{action} of conflicted booking {conflicted_id} returned {response['statusCode']}: {response['body']}")
+
+        owners = slot_owners(common, bike_id, first_slot, first_slot + timedelta(hours=2))
+        held = common.booking_slots(first_slot, first_slot + timedelta(hours=1))
+        lost = [slot for slot in held if owners.get(slot) != held_id]
+        if lost:
+            problems.append(f'{action}: booking {held_id} lost slot(s) {lost}')
+        stray = sorted(slot for slot, owner in owners.items() if owner == conflicted_id)
+        if stray:
+            problems.append(f'{action}: booking {conflicted_id} still holds {stray} of its old window')
+
+    if problems:
+        print('\nLegacy booking check failed:', file=sys.stderr)
+        for problem in problems:
+            print(f'  {problem}', file=sys.stderr)
+        return 1
+    print('Conflicted legacy bookings cancel and reschedule cleanly', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Concurrency stress test for create_booking against a local DynamoDB
+
+Fires many create_booking calls in parallel for heavily overlapping windows on
+one bike, then reads back every active booking of that bike and fails if any
+two of them overlap, or if the number of bookings does not match the number of
+201 responses. It drives the real handler and the shared layer in-process, so
+the only thing under test is the conditional slot-claim transaction.
+
+Usage (from backend/, with DynamoDB Local on port 8000):
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python tools/booking_stress.py --create-tables
+    python tools/booking_stress.py --requests 500 --workers 64 --rounds 3
+
+The booking confirmation email is not sent: the handler's SNS client is
+replaced with one that drops messages, since only DynamoDB is emulated.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOKING_MODULE_DIR = os.path.join(BACKEND_DIR, 'booking-module')
+sys.path[:0] = [os.path.join(BOOKING_MODULE_DIR, 'lambdas'), os.path.join(BOOKING_MODULE_DIR, 'layer', 'python')]
+
+BOOKINGS_TABLE = 'DALScooterBookings'
+SLOTS_TABLE = 'DALScooterBikeSlots'
+BIKE_INVENTORY_TABLE = 'BikeInventoryTable'
+
+class DroppedNotifications:
+    """
+    Stand-in SNS client: DynamoDB Local does not emulate SNS
+    """
+    def publish(self, **kwargs):
+        return {'MessageId': 'dropped'}
+
+def create_tables(dynamodb, bookings_table=BOOKINGS_TABLE, slots_table=SLOTS_TABLE):
+    """
+    Create the tables the handler touches, with the keys and indexes it relies on
+    """
+    existing = set(dynamodb.list_tables()['TableNames'])
+    definitions = {
+        bookings_table: {
+            'AttributeDefinitions': [
+                {'AttributeName': name, 'AttributeType': 'S'}
+                for name in ('bookingId', 'recordType', 'createdAt')
+            ],
+            'KeySchema': [{'AttributeName': 'bookingId', 'KeyType': 'HASH'}],
+            'GlobalSecondaryIndexes': [{
+                'IndexName': 'CreatedAtIndex',
+                'KeySchema': [
+                    {'AttributeName': 'recordType', 'KeyType': 'HASH'},
+                    {'AttributeName': 'createdAt', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }]
+        },
+        slots_table: {
+            'AttributeDefinitions': [
+                {'AttributeName': 'bikeId', 'AttributeType': 'S'},
+                {'AttributeName': 'slotStart', 'AttributeType': 'S'}
+            ],
+            'KeySchema': [
+                {'AttributeName': 'bikeId', 'KeyType': 'HASH'},
+                {'AttributeName': 'slotStart', 'KeyType': 'RANGE'}
+            ]
+        },
+        BIKE_INVENTORY_TABLE: {
+            'AttributeDefinitions': [{'AttributeName': 'bikeId', 'AttributeType': 'S'}],
+            'KeySchema': [{'AttributeName': 'bikeId', 'KeyType': 'HASH'}]
+        }
+    }
+    for table_name, definition in definitions.items():
+        if table_name not in existing:
+            dynamodb.create_table(TableName=table_name, BillingMode='PAY_PER_REQUEST', **definition)
+            dynamodb.get_waiter('table_exists').wait(TableName=table_name)
+            print(f'Created {table_name}', file=sys.stderr)
+
+def booking_request(bike_id, first_slot, args):
+    """
+    A create_booking event for a random window inside the contended span
+    """
+    start = first_slot + timedelta(minutes=15 * random.randrange(args.span_slots))
+    end = start + timedelta(minutes=15 * random.randint(1, args.max_length_slots))
+    body = {
+        'bikeId': bike_id,
+        'startDate': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'endDate': end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'duration': max(1, round((end - start).total_seconds() / 3600))
+    }
+    return {
+        'body': json.dumps(body),
+        'requestContext': {'authorizer': {'jwt': {'claims': {
+            'sub': f'stress-{uuid.uuid4()}',
+            'email': 'stress@example.com',
+            'cognito:groups': ''
+        }}}}
+    }
+
+def active_bookings(common, bike_id):
+    scan_params = {
+        'TableName': BOOKINGS_TABLE,
+        'FilterExpression': 'bikeId = :bikeId AND #status = :active',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':bikeId': {'S': bike_id}, ':active': {'S': 'active'}},
+        'ProjectionExpression': 'bookingId, startDate, endDate'
+    }
+    items = []
+    while True:
+        response = common.dynamodb.scan(**scan_params)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def double_bookings(common, bookings):
+    """
+    Return the (earlier, later) pairs of overlapping bookings
+    """
+    windows = sorted(
+        (common.parse_date(item['startDate']['S']), common.parse_date(item['endDate']['S']), item['bookingId']['S'])
+        for item in bookings
+    )
+    overlaps = []
+    latest_end, latest_id = None, None
+    for start, end, booking_id in windows:
+        if latest_end is not None and start < latest_end:
+            overlaps.append((latest_id, booking_id))
+        if latest_end is None or end > latest_end:
+            latest_end, latest_id = end, booking_id
+    return overlaps
+
+def run_round(handler, common, args, round_number):
+    bike_id = f'stress-bike-{uuid.uuid4()}'
+    common.dynamodb.put_item(TableName=BIKE_INVENTORY_TABLE, Item={
+        'bikeId': {'S': bike_id},
+        'status': {'S': 'available'},
+        'model': {'S': 'Stress'},
+        'type': {'S': 'eBike'},
+        'version': {'N': '1'}
+    })
+    first_slot = (datetime.now(timezone.utc) + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    events = [booking_request(bike_id, first_slot, args) for _ in range(args.requests)]
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        statuses = Counter(response['statusCode'] for response in executor.map(lambda event: handler(event, None), events))
+
+    bookings = active_bookings(common, bike_id)
+    overlaps = double_bookings(common, bookings)
+    print(f'Round {round_number}: {dict(sorted(statuses.items()))} -> {len(bookings)} active booking(s), '
+          f'{len(overlaps)} overlap(s) on {bike_id}', file=sys.stderr)
+
+    problems = [f'{earlier} overlaps {later}' for earlier, later in overlaps]
+    if statuses[201] != len(bookings):
+        problems.append(f'{statuses[201]} created response(s) but {len(bookings)} stored booking(s)')
+    unexpected = {status: count for status, count in statuses.items() if status not in (201, 409)}
+    if unexpected:
+        problems.append(f'unexpected responses: {unexpected}')
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress create_booking with overlapping concurrent requests')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--create-tables', action='store_true', help='create the booking tables if they are missing')
+    parser.add_argument('--requests', type=int, default=200, help='create_booking calls per round')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent calls')
+    parser.add_argument('--rounds', type=int, default=1, help='rounds, each on a fresh bike')
+    parser.add_argument('--span-slots', type=int, default=16, help='15-minute slots the windows start in')
+    parser.add_argument('--max-length-slots', type=int, default=8, help='longest window, in 15-minute slots')
+    args = parser.parse_args()
+
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    # DynamoDB Local accepts any credentials
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stress')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stress')
+    os.environ.update({
+        'BOOKINGS_TABLE': BOOKINGS_TABLE,
+        'SLOTS_TABLE': SLOTS_TABLE,
+        'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE,
+        'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:stress',
+        'MAX_POOL_CONNECTIONS': str(args.workers)
+    })
+    # Imported late so the endpoint and pool size apply to the shared client
+    import booking_common as common
+    common._clients['sns'] = DroppedNotifications()
+    from create_booking_lambda import lambda_handler
+
+    if args.create_tables:
+        create_tables(common.dynamodb)
+
+    problems = []
+    for round_number in range(1, args.rounds + 1):
+        problems.extend(run_round(lambda_handler, common, args, round_number))
+
+    if problems:
+        print('\nDouble-booking check failed:', file=sys.stderr)
+        for problem in problems:
+            print(f'  {problem}', file=sys.stderr)
+        return 1
+    print('No double bookings', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Cold-start import budget check for the Lambda handlers
+
+Imports every handler under backend/*/lambdas in a fresh interpreter with
+`python -X importtime`, takes the median cumulative import time over a few
+runs and compares it with the budget recorded in import_budgets.json.
+Exits non-zero if any handler is over budget, so it can gate a deploy.
+
+Usage (from backend/):
+    python tools/check_import_budget.py             # check against budgets
+    python tools/check_import_budget.py --record    # rewrite budgets from this machine
+
+Handlers read their table names from the environment at import time, so
+placeholder values are supplied; AWS clients are only constructed, never called.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGETS_FILE = os.path.join(BACKEND_DIR, 'tools', 'import_budgets.json')
+
+# Headroom applied by --record on top of the measured median, with a floor so
+# handlers that import in a few milliseconds don't fail on scheduler noise
+RECORD_HEADROOM = 1.5
+RECORD_FLOOR_MS = 20
+
+PLACEHOLDER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'import-budget',
+    'AWS_SECRET_ACCESS_KEY': 'import-budget',
+    'BIKE_INVENTORY_TABLE': 'BikeInventoryTable',
+    'BOOKINGS_TABLE': 'DALScooterBookings',
+    'BOOKINGS_TABLE_NAME': 'DALScooterBookings',
+    'DYNAMODB_TABLE': 'BikeInventoryTable',
+    'DYNAMODB_TABLE_NAME': 'placeholder',
+    'FEEDBACK_SUMMARY_TABLE': 'FeedbackSummaryTable',
+    'FEEDBACK_TABLE': 'FeedbackTable',
+    'LOGIN_TABLE_NAME': 'UserLogins',
+    'REGISTRATION_QUEUE_URL': 'https://sqs.us-east-1.amazonaws.com/000000000000/placeholder',
+    'REPLIES_TABLE': 'placeholder',
+    'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:placeholder',
+    'STATS_TABLE_NAME': 'DALScooterDashboardStats',
+    'USER_LOGINS_TABLE_NAME': 'UserLogins',
+    'USER_POOL_ID': 'us-east-1_placeholder',
+}
+
+def find_handlers():
+    """
+    Return {relative handler path: (module name, sys.path entries)}
+    """
+    handlers = {}
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, '*', 'lambdas', '*.py'))):
+        lambdas_dir = os.path.dirname(path)
+        search_path = [lambdas_dir]
+        # Modules that ship a layer import it from /opt/python at runtime
+        layer_dir = os.path.join(os.path.dirname(lambdas_dir), 'layer', 'python')
+        if os.path.isdir(layer_dir):
+            search_path.append(layer_dir)
+        module = os.path.splitext(os.path.basename(path))[0]
+        handlers[os.path.relpath(path, BACKEND_DIR).replace(os.sep, '/')] = (module, search_path)
+    return handlers
+
+def measure_import_ms(module, search_path):
+    """
+    Import the module once in a fresh interpreter and return its cumulative
+    import time in milliseconds, as reported by -X importtime
+    """
+    env = dict(os.environ)
+    for name, value in PLACEHOLDER_ENV.items():
+        env.setdefault(name, value)
+    env['PYTHONPATH'] = os.pathsep.join(search_path)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'importing {module} failed:\n{result.stderr.strip()[-2000:]}')
+
+    # Lines look like "import time:   self [us] | cumulative |   package"
+    for line in reversed(result.stderr.splitlines()):
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000.0
+    raise RuntimeError(f'no importtime entry for {module}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Check Lambda handler cold-start import budgets')
+    parser.add_argument('--runs', type=int, default=5, help='imports per handler (median is used)')
+    parser.add_argument('--record', action='store_true', help='write budgets from the current measurements')
+    args = parser.parse_args()
+
+    budgets = {}
+    if os.path.exists(BUDGETS_FILE):
+        with open(BUDGETS_FILE) as f:
+            budgets = json.load(f)
+
+    measured = {}
+    failures = []
+    for handler, (module, search_path) in find_handlers().items():
+        try:
+            median_ms = statistics.median(measure_import_ms(module, search_path) for _ in range(args.runs))
+        except RuntimeError as e:
+            failures.append(f'{handler}: {e}')
+            continue
+        measured[handler] = median_ms
+
+        budget_ms = budgets.get(handler)
+        if budget_ms is None:
+            status = 'NO BUDGET'
+            if not args.record:
+                failures.append(f'{handler}: no budget recorded')
+        elif median_ms > budget_ms:
+            status = 'OVER'
+            failures.append(f'{handler}: {median_ms:.1f} ms > budget {budget_ms} ms')
+        else:
+            status = 'ok'
+        print(f'{status:>9}  {median_ms:8.1f} ms  / {budget_ms if budget_ms is not None else "-":>6}  {handler}')
+
+    if args.record:
+        with open(BUDGETS_FILE, 'w') as f:
+            json.dump({
+                h: max(RECORD_FLOOR_MS, int(ms * RECORD_HEADROOM) + 1) for h, ms in sorted(measured.items())
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Recorded {len(measured)} budget(s) to {os.path.relpath(BUDGETS_FILE, BACKEND_DIR)}')
+
+    if failures:
+        print('\nImport budget check failed:', file=sys.stderr)
+        for failure in failures:
+            print(f'  {failure}', file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())